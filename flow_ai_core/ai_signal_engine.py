@@ -9,6 +9,7 @@ import ta # Replaced talib
 # pandas is already imported as pd at the top of the file
 from ..news_handler import EconomicNewsHandler
 from .. import config # To access news configuration settings
+from .risk_manager import ACTION_DIRECTIONS
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +174,7 @@ class AISignalEngine:
                         # Construct a 'HOLD' signal response including current price from indicators
                         return {
                             'action': 'HOLD',
+                            'direction': 0,
                             'reason': reason,
                             'confidence': 0.99, # High confidence in holding due to news
                             'current_price': indicators.get('price', 0.0),
@@ -316,6 +318,7 @@ class AISignalEngine:
             if confidence >= 0.6 or force_analysis:
                 return {
                     'action': action,
+                    'direction': ACTION_DIRECTIONS.get(action, 0),
                     'confidence': confidence,
                     'entry_price': entry_price,
                     'target_price': target_price,
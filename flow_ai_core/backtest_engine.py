@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 from .ai_signal_engine import AISignalEngine
 from .data_handler import get_processed_data
 import json
@@ -20,8 +20,9 @@ class BacktestEngine:
                     end_date: str = "2024-12-31",
                     initial_balance: float = 10000,
                     timeframe: str = "1h",
-                    risk_per_trade: float = 0.02) -> Dict:
-        """اجرای بک‌تست کامل"""
+                    risk_per_trade: float = 0.02,
+                    progress_callback: Optional[Callable[[float], None]] = None) -> Dict:
+        """اجرای بک‌تست کامل (progress_callback با کسر پیشرفت 0 تا 1 صدا زده می‌شود)"""
         
         try:
             logger.info(f"Starting backtest: {symbol} from {start_date} to {end_date}")
@@ -38,7 +39,14 @@ class BacktestEngine:
             position = None
             equity_curve = []
             
+            # گزارش پیشرفت حداکثر 100 بار در طول بک‌تست
+            total_steps = max(len(data) - 50, 1)
+            progress_step = max(total_steps // 100, 1)
+            
             for i in range(50, len(data)):  # شروع از ایندکس 50 برای اندیکاتورها
+                if progress_callback is not None and (i - 50) % progress_step == 0:
+                    progress_callback((i - 50) / total_steps)
+                
                 current_data = data.iloc[:i+1]
                 current_price = data.iloc[i]['Close']
                 current_time = data.index[i]
@@ -357,7 +365,8 @@ def run_backtest_analysis(symbol: str = "GOLD",
                          end_date: str = "2024-12-31",
                          initial_balance: float = 10000,
                          timeframe: str = "1h",
-                         risk_per_trade: float = 0.02) -> Dict:
+                         risk_per_trade: float = 0.02,
+                         progress_callback: Optional[Callable[[float], None]] = None) -> Dict:
     """تابع global برای اجرای بک‌تست"""
     return backtest_engine.run_backtest(
         symbol=symbol,
@@ -365,9 +374,22 @@ def run_backtest_analysis(symbol: str = "GOLD",
         end_date=end_date,
         initial_balance=initial_balance,
         timeframe=timeframe,
-        risk_per_trade=risk_per_trade
+        risk_per_trade=risk_per_trade,
+        progress_callback=progress_callback
     )
 
 def get_backtest_summary() -> str:
     """دریافت خلاصه آخرین بک‌تست"""
     return backtest_engine.export_results("summary")
+
+def run_isolated_backtest(params: Dict, progress_callback: Optional[Callable[[float], None]] = None) -> str:
+    """اجرای بک‌تست با engine جداگانه و برگرداندن خلاصه همان اجرا
+    
+    اجراهای هم‌زمان (منوی ادمین و کاربران) نتایج یکدیگر را بازنویسی نمی‌کنند؛
+    نتیجه پس از پایان برای گزارش‌ها در نمونه global هم ثبت می‌شود.
+    """
+    engine = BacktestEngine()
+    engine.run_backtest(**params, progress_callback=progress_callback)
+    summary = engine.export_results("summary")
+    backtest_engine.results = engine.results
+    return summary
@@ -1,4 +1,3 @@
-import requests
 import logging
 from datetime import datetime
 from typing import Optional, Dict, Any # Added Dict, Any
@@ -6,6 +5,7 @@ import pandas as pd
 import numpy as np # Added
 import jdatetime # Added
 from ..config import USD_IRR_EXCHANGE_RATE
+from ..http_client import HTTP_SESSION
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,8 @@ class BrsAPIFetcher:
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        # Shared keep-alive session so repeated calls skip the TCP+TLS handshake
+        self.session = HTTP_SESSION
         self.daily_limit = 8000
         self.minute_limit = 45
         self.daily_calls = 0
@@ -65,7 +67,7 @@ class BrsAPIFetcher:
             return None
         try:
             params['key'] = self.api_key
-            response = requests.get(self.base_url, params=params, headers=self.headers, timeout=10)
+            response = self.session.get(self.base_url, params=params, headers=self.headers, timeout=10)
             self.daily_calls += 1
             self.minute_calls += 1
             if response.status_code == 200:
@@ -0,0 +1,18 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Process-wide session shared by the synchronous fetchers and webhooks:
+# one pool manager keeps TCP/TLS connections alive per host
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+# BrsAPI calls count against a daily quota, so they are not retried automatically
+HTTP_SESSION.mount('https://brsapi.ir/', HTTPAdapter(pool_connections=1, pool_maxsize=20))
+
+def close_http_session():
+    """Release pooled connections (called on bot shutdown)"""
+    HTTP_SESSION.close()
@@ -0,0 +1,47 @@
+import logging
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# ستون‌های الگوهای ICT به ترتیب ورودی count_patterns
+ICT_PATTERN_COLUMNS = ['Bullish_OB', 'Bearish_OB', 'Bullish_FVG', 'Bearish_FVG',
+                       'Buy_Side_Liquidity_Sweep', 'Sell_Side_Liquidity_Sweep']
+
+def _count_patterns_py(bob, beob, bfvg, befvg, bsl, ssl):
+    """شمارش Order Block، FVG و Liquidity Sweep در یک پیمایش"""
+    n = bob.shape[0]
+    ob = 0
+    fvg = 0
+    lq = 0
+    for i in range(n):
+        ob += bob[i] + beob[i]
+        fvg += bfvg[i] + befvg[i]
+        lq += bsl[i] + ssl[i]
+    return ob, fvg, lq
+
+if NUMBA_AVAILABLE:
+    count_patterns = njit(cache=True, fastmath=True)(_count_patterns_py)
+else:
+    count_patterns = None
+
+def count_ict_patterns(data: pd.DataFrame) -> Tuple[int, int, int]:
+    """تعداد (Order Blocks, FVGs, Liquidity Sweeps) در کل DataFrame"""
+    # آرایه‌های int8 پیوسته؛ جمع bool در numpy به OR منطقی تبدیل می‌شود
+    arrays = [data[col].to_numpy(dtype=np.int8, na_value=0) for col in ICT_PATTERN_COLUMNS]
+
+    if count_patterns is not None:
+        ob, fvg, lq = count_patterns(*arrays)
+        return int(ob), int(fvg), int(lq)
+
+    # بدون numba جمع برداری numpy سریع‌تر از حلقه پایتون است
+    sums = [int(a.sum()) for a in arrays]
+    return sums[0] + sums[1], sums[2] + sums[3], sums[4] + sums[5]
@@ -1,10 +1,37 @@
+import time
 import requests
 import logging
-from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional, Any
+import numpy as np
+import pandas as pd
+from itertools import islice
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+from .http_client import HTTP_SESSION
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Decode errors raised by whichever JSON parser is in use
+_JSON_ERRORS = (ValueError, ijson.JSONError) if ijson else (ValueError,)
 
 logger = logging.getLogger(__name__)
 
+# Shared session: keeps TCP/TLS connections alive between news refreshes
+_HTTP = HTTP_SESSION
+
+# Returned by _fetch_raw_news when the server answers 304 Not Modified
+_NOT_MODIFIED = object()
+
+# Number of raw events filtered per DataFrame chunk
+_EVENT_BATCH_SIZE = 1024
+
 class EconomicNewsHandler:
     def __init__(self,
                  news_url: str,
@@ -14,61 +41,135 @@ class EconomicNewsHandler:
         self.news_url = news_url
         self.monitored_currencies = [c.upper() for c in monitored_currencies]
         self.monitored_impacts = [i.lower() for i in monitored_impacts] # Store impacts as lowercase for case-insensitive compare
+        # Hashed lookups for the filter step
+        self._monitored_set = frozenset(self.monitored_currencies)
+        self._impacts_set = frozenset(self.monitored_impacts)
         self.cache_ttl_seconds = cache_ttl_seconds
 
         self.news_events: List[Dict[str, Any]] = []
+        # Event times as int64 ns since epoch, parallel to news_events (same sort order) for searchsorted lookups
+        self._event_ns: np.ndarray = np.empty(0, dtype=np.int64)
+        # Bounds of _event_ns, for the "nothing near now" fast path
+        self._events_min_ns: Optional[int] = None
+        self._events_max_ns: Optional[int] = None
         self.last_updated_utc: Optional[datetime] = None
+        self._last_updated_ns: int = 0 # last_updated_utc as ns since epoch (0 = never)
+        # Validators from the last successful fetch, used for conditional GETs
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
 
         self.fetch_and_process_news()
 
-    def _fetch_raw_news(self) -> Optional[List[Dict]]:
+    def _fetch_raw_news(self) -> Optional[Any]:
+        """
+        Returns the raw events (a list, or an iterator when ijson streaming is available),
+        _NOT_MODIFIED on a 304, or None on failure.
+        """
         try:
             logger.info(f"Fetching news from {self.news_url}")
-            response = requests.get(self.news_url, timeout=15) # Added timeout
+            headers = {'Accept-Encoding': 'gzip, deflate'}
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+            stream = ijson is not None
+            response = _HTTP.get(self.news_url, headers=headers, timeout=15, stream=stream) # Added timeout
+            if response.status_code == 304:
+                response.close()
+                logger.info("News feed not modified since last fetch.")
+                return _NOT_MODIFIED
+            if not response.ok:
+                response.close()
             response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-            raw_events = response.json()
+            if stream:
+                return self._stream_raw_news(response)
+            raw_events = orjson.loads(response.content) if orjson else response.json()
             if not isinstance(raw_events, list):
                 logger.error(f"Fetched news data is not a list as expected. URL: {self.news_url}")
                 return None
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
             logger.info(f"Successfully fetched {len(raw_events)} raw events.")
             return raw_events
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching news from {self.news_url}: {e}")
             return None
-        except ValueError as e: # Includes JSONDecodeError
+        except _JSON_ERRORS as e: # Includes JSONDecodeError
             logger.error(f"Error decoding JSON from {self.news_url}: {e}")
             return None
 
-    def _parse_event(self, raw_event: Dict) -> Optional[Dict[str, Any]]:
+    def _stream_raw_news(self, response: requests.Response) -> Optional[Iterator[Dict]]:
+        """
+        Streams events out of the response body with ijson, one dict at a time,
+        so the full feed is never materialized as a Python list.
+        """
+        raw = response.raw
+        raw.decode_content = True # Let urllib3 undo gzip/deflate
         try:
-            title = raw_event.get('title')
-            country = raw_event.get('country')
-            date_str = raw_event.get('date')
-            impact = raw_event.get('impact')
+            parse_events = ijson.parse(raw)
+            _, first_event, _ = next(parse_events, ('', None, None))
+        except Exception:
+            response.close()
+            raise
+        if first_event != 'start_array':
+            response.close()
+            logger.error(f"Fetched news data is not a list as expected. URL: {self.news_url}")
+            return None
+        self._etag = response.headers.get('ETag')
+        self._last_modified = response.headers.get('Last-Modified')
+        logger.info("Streaming raw events.")
 
-            if not all([title, country, date_str, impact]):
-                logger.warning(f"Skipping event due to missing essential fields: {raw_event}")
-                return None
+        def _iter_events():
+            try:
+                yield from ijson.items(parse_events, 'item')
+            finally:
+                response.close()
 
-            # Parse ISO 8601 date string and convert to UTC
-            # datetime.fromisoformat handles strings like "2025-06-08T18:45:00-04:00"
-            # and correctly interprets the timezone offset.
-            event_time_aware = datetime.fromisoformat(date_str)
-            event_time_utc = event_time_aware.astimezone(timezone.utc)
-
-            return {
-                'title': str(title),
-                'country': str(country).upper(),
-                'event_time_utc': event_time_utc,
-                'impact': str(impact).lower() # Store impact as lowercase
-            }
-        except ValueError as e: # For fromisoformat errors or other type issues
-            logger.warning(f"Error parsing raw event {raw_event}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"Unexpected error parsing event {raw_event}: {e}")
-            return None
+        return _iter_events()
 
+    def _process_events_frame(self, raw_events: Iterable[Dict]) -> pd.DataFrame:
+        """
+        Parses and filters raw events in vectorized chunks of _EVENT_BATCH_SIZE rows,
+        so only relevant events stay resident while a streamed feed is consumed.
+        Returns a frame with title/country/event_time_utc/impact columns, sorted by event_time_utc.
+        """
+        essential_cols = ['title', 'country', 'date', 'impact']
+        events_iter = iter(raw_events)
+        chunks = []
+        skipped = 0
+        while True:
+            batch = list(islice(events_iter, _EVENT_BATCH_SIZE))
+            if not batch:
+                break
+            df = pd.DataFrame(batch, columns=essential_cols)
+
+            # Drop events with missing (or empty) essential fields
+            df = df.dropna(subset=essential_cols)
+            df = df[(df[essential_cols] != '').all(axis=1)]
+            skipped += len(batch) - len(df)
+
+            # Filter on country/impact before any date parsing so only relevant rows are parsed.
+            # Values are cast to str first: .str raises AttributeError on a column with no strings,
+            # and non-string values (e.g. numbers) never match the monitored sets after the cast.
+            country = df['country'].astype(str).str.upper()
+            impact = df['impact'].astype(str).str.lower() # Store impact as lowercase
+            mask = country.isin(self._monitored_set) & impact.isin(self._impacts_set)
+            # Series are masked too: assigning a full-length Series to an empty frame would re-add every row
+            chunks.append(df[mask].assign(title=df['title'][mask].astype(str), country=country[mask], impact=impact[mask]))
+
+        if skipped:
+            logger.warning(f"Skipping {skipped} events due to missing essential fields.")
+
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=essential_cols)
+
+        # Parse ISO 8601 date strings (e.g. "2025-06-08T18:45:00-04:00") straight to UTC
+        df = df.assign(event_time_utc=pd.to_datetime(df['date'], utc=True, format='ISO8601', errors='coerce'))
+        unparsable = int(df['event_time_utc'].isna().sum())
+        if unparsable:
+            logger.warning(f"Skipping {unparsable} events with unparsable dates.")
+            df = df.dropna(subset=['event_time_utc'])
+
+        return df[['title', 'country', 'event_time_utc', 'impact']].sort_values('event_time_utc', kind='stable')
 
     def fetch_and_process_news(self, force_update: bool = False):
         now_utc = datetime.now(timezone.utc)
@@ -86,16 +187,29 @@ class EconomicNewsHandler:
             # For now, we'll keep stale data if fetching fails, but last_updated_utc won't change.
             return
 
-        processed_and_filtered_events: List[Dict[str, Any]] = []
-        for raw_event in raw_events:
-            parsed_event = self._parse_event(raw_event)
-            if parsed_event:
-                if (parsed_event['country'] in self.monitored_currencies and
-                    parsed_event['impact'] in self.monitored_impacts):
-                    processed_and_filtered_events.append(parsed_event)
+        if raw_events is _NOT_MODIFIED:
+            # Cached events are still current; just restart the TTL window
+            self.last_updated_utc = now_utc
+            self._last_updated_ns = time.time_ns()
+            return
 
-        self.news_events = sorted(processed_and_filtered_events, key=lambda x: x['event_time_utc'])
+        try:
+            events_df = self._process_events_frame(raw_events)
+        except Exception as e:
+            logger.error(f"Unexpected error processing raw news events: {e}")
+            # Forget the validators so the next fetch downloads the full feed again
+            self._etag = self._last_modified = None
+            return
+
+        self.news_events = events_df.to_dict('records')
+        self._event_ns = pd.DatetimeIndex(events_df['event_time_utc']).asi8
+        if len(self._event_ns):
+            self._events_min_ns = int(self._event_ns[0])
+            self._events_max_ns = int(self._event_ns[-1])
+        else:
+            self._events_min_ns = self._events_max_ns = None
         self.last_updated_utc = now_utc # Set update time only on successful fetch and process
+        self._last_updated_ns = time.time_ns()
 
         logger.info(f"Successfully processed and filtered news. Loaded {len(self.news_events)} relevant events. Last updated: {self.last_updated_utc}")
 
@@ -107,10 +221,12 @@ class EconomicNewsHandler:
         An event is considered 'active' from 'minutes_before_event_start' before its time
         until 'minutes_after_event_start' after its time.
         """
+        now_ns = time.time_ns()
+
         # Ensure news is reasonably fresh, otherwise try to update it.
         # This threshold can be adjusted, e.g., if cache_ttl_seconds is very long.
-        if not self.last_updated_utc or \
-           (datetime.now(timezone.utc) - self.last_updated_utc).total_seconds() > self.cache_ttl_seconds / 2: # e.g. if older than half TTL
+        if not self._last_updated_ns or \
+           (now_ns - self._last_updated_ns) / 10**9 > self.cache_ttl_seconds / 2: # e.g. if older than half TTL
             logger.info("News data might be stale, attempting a refresh before getting upcoming events.")
             self.fetch_and_process_news(force_update=False) # Respect cache TTL but try if very old
 
@@ -118,26 +234,20 @@ class EconomicNewsHandler:
             logger.info("No news events loaded to check for upcoming relevant events.")
             return []
 
-        relevant_now_events = []
-        now_utc = datetime.now(timezone.utc)
-
-        # Define the window for checking "active" news
-        # An event is active if current time is between (event_time - before_minutes) and (event_time + after_minutes)
+        # An event at time T is active if (T - before_minutes) <= now <= (T + after_minutes),
+        # i.e. if (now - after_minutes) <= T <= (now + before_minutes).
+        window_start_ns = now_ns - minutes_after_event_start * 60 * 10**9
+        window_end_ns = now_ns + minutes_before_event_start * 60 * 10**9
 
-        for event in self.news_events:
-            event_time = event['event_time_utc']
-
-            # Time window for this event to be considered "active"
-            window_start = event_time - timedelta(minutes=minutes_before_event_start)
-            window_end = event_time + timedelta(minutes=minutes_after_event_start)
+        # Fast path: the whole cached range lies outside the window
+        if window_end_ns < self._events_min_ns or window_start_ns > self._events_max_ns:
+            logger.debug("No relevant news events active around current time.")
+            return []
 
-            if window_start <= now_utc <= window_end:
-                relevant_now_events.append(event)
-            # Optimization: if events are sorted, and current event is far in future, can break
-            # elif event_time > now_utc + timedelta(minutes=minutes_after_event_start):
-            # This optimization is only valid if minutes_before_event_start is always positive or zero.
-            # For simplicity, iterate all if the list is not excessively long.
-            # If list is very long and sorted, more efficient filtering can be done.
+        # news_events is sorted by event_time_utc, so search the window endpoints and slice.
+        lo = int(np.searchsorted(self._event_ns, window_start_ns, side='left'))
+        hi = int(np.searchsorted(self._event_ns, window_end_ns, side='right'))
+        relevant_now_events = self.news_events[lo:hi]
 
         if relevant_now_events:
             logger.info(f"Found {len(relevant_now_events)} relevant news events active around current time.")
@@ -175,7 +285,6 @@ if __name__ == '__main__':
         logger.info(f"No upcoming/active events found in the next ~2 hours (considering +/- window).")
 
     # Test caching - should say "News cache is still fresh" if called within CACHE_TTL
-    import time
     logger.info("Waiting for 10 seconds and trying to fetch again (should use cache)...")
     time.sleep(10)
     handler.fetch_and_process_news()
@@ -1,33 +1,173 @@
+import asyncio
+import json
 import logging
 import smtplib
-import requests
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+import threading
+import time
+import httpx
+from collections import deque
+from itertools import islice
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from typing import Dict, List, Optional
 from datetime import datetime
 from telegram import Bot
-from telegram.error import TelegramError
-from .config import TELEGRAM_BOT_TOKEN
+from telegram.request import HTTPXRequest
+from .config import TELEGRAM_BOT_TOKEN, TELEGRAM_ADMIN_IDS
+from .http_client import HTTP_SESSION
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# session مشترک برای webhook ها تا اتصال‌های TCP/TLS دوباره استفاده شوند
+_HTTP = HTTP_SESSION
+
+_EMAIL_TMPL = """
+<html>
+    <body>
+        <h2>FlowAI Trading Bot Notification</h2>
+        <p><strong>Priority:</strong> {priority}</p>
+        <p><strong>Time:</strong> {ts}</p>
+        <hr>
+        <div>{message_html}</div>
+        <hr>
+        <p><small>This is an automated message from FlowAI Trading Bot</small></p>
+    </body>
+</html>
+"""
+
+_ALERT_TMPL = """
+🚨 **هشدار سیستم FlowAI**
+
+🔸 **نوع:** {alert_type}
+🔸 **زمان:** {ts}
+
+📝 **پیام:**
+{message}
+
+⚠️ این هشدار نیاز به بررسی فوری دارد.
+"""
+
+_BR_TABLE = str.maketrans({'\n': '<br>'})
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(payload: Dict) -> bytes:
+    """سریال‌سازی JSON (با orjson در صورت نصب بودن)"""
+    if orjson:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_json_default).encode('utf-8')
+
+# backoff مدارشکن مقصدهای ناموفق (ثانیه)
+CIRCUIT_BASE_BACKOFF = 1.0
+CIRCUIT_MAX_BACKOFF = 60.0
+
+# timeout های webhook: اتصال 2 ثانیه، خواندن 5 ثانیه
+_WEBHOOK_TIMEOUT = httpx.Timeout(5.0, connect=2.0)
+
+# event loop ماندگار اطلاع‌رسانی‌ها (یک بار ساخته می‌شود)؛ pool اتصال‌های ربات فقط روی همین loop استفاده می‌شود
+_coro_loop = None
+_coro_loop_lock = threading.Lock()
+
+def _get_coro_loop() -> asyncio.AbstractEventLoop:
+    """ساخت (یک بار) و برگرداندن event loop پس‌زمینه"""
+    global _coro_loop
+    with _coro_loop_lock:
+        if _coro_loop is None:
+            _coro_loop = asyncio.new_event_loop()
+            threading.Thread(target=_coro_loop.run_forever, name="notification-loop", daemon=True).start()
+    return _coro_loop
+
+def _run_coroutine(coro):
+    """اجرای coroutine روی loop اطلاع‌رسانی‌ها و انتظار برای نتیجه (فقط از کد همگام؛ داخل event loop از نسخه‌های async استفاده شود)"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_coro_loop()).result()
+
+# client مشترک webhook ها؛ روی loop اطلاع‌رسانی‌ها ساخته و همان‌جا استفاده می‌شود
+_webhook_client: Optional[httpx.AsyncClient] = None
+
+def _get_webhook_client() -> httpx.AsyncClient:
+    """client ماندگار webhook (فقط از coroutine های loop اطلاع‌رسانی‌ها صدا زده شود)"""
+    global _webhook_client
+    if _webhook_client is None or _webhook_client.is_closed:
+        _webhook_client = httpx.AsyncClient(timeout=_WEBHOOK_TIMEOUT, limits=httpx.Limits(max_connections=64))
+    return _webhook_client
+
+async def _await_on_coro_loop(coro):
+    """اجرای coroutine روی loop اطلاع‌رسانی‌ها و await نتیجه از یک event loop دیگر (بدون block)"""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_coro_loop()))
+
 class NotificationSystem:
+    # emoji بر اساس اولویت
+    priority_emojis = {
+        'low': '🔵',
+        'normal': '🟡',
+        'high': '🟠',
+        'critical': '🔴'
+    }
+    
     def __init__(self):
-        self.telegram_bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        # pool بزرگ‌تر تا ارسال همزمان به چند کاربر در صف اتصال گیر نکند
+        self.telegram_bot = Bot(
+            token=TELEGRAM_BOT_TOKEN,
+            request=HTTPXRequest(connection_pool_size=64, connect_timeout=2.0, read_timeout=5.0)
+        )
         self.email_config = {
             'smtp_server': 'smtp.gmail.com',
             'smtp_port': 587,
             'username': '',  # باید در config تنظیم شود
             'password': '',  # باید در config تنظیم شود
         }
+        self._smtp: Optional[smtplib.SMTP] = None  # اتصال SMTP ماندگار بین ارسال‌ها
+        self._smtp_lock = threading.Lock()  # دسترسی هم‌زمان thread ها به self._smtp
         self.webhook_urls = []
-        self.notification_history = []
+        self.notification_history = deque(maxlen=1000)  # نگهداری آخرین 1000 رکورد
+        
+        # آمار تجمعی تاریخچه (همراه با هر ثبت به‌روزرسانی می‌شود)
+        self._stats_total_sent = 0
+        self._stats_total_failed = 0
+        self._channel_stats: Dict[str, Dict] = {}
+        self._priority_stats: Dict[str, Dict] = {}
+        self._stats_lock = threading.Lock()
+        
+        # مخاطبان هشدارهای سیستم (یک بار ساخته می‌شوند؛ refresh_recipients برای بارگذاری مجدد)
+        self._admin_ids = tuple(TELEGRAM_ADMIN_IDS)
+        self._alert_subscribers = None
+        
+        # circuit breaker برای هر مقصد: کلید -> زمان (monotonic) پایان مسدودی / backoff فعلی
+        self._circuit: Dict[str, float] = {}
+        self._circuit_backoff: Dict[str, float] = {}
         
-    def send_telegram_notification(self, 
-                                 user_ids: List[int], 
-                                 message: str, 
-                                 priority: str = "normal") -> Dict:
-        """ارسال اطلاع‌رسانی تلگرام"""
+    def _circuit_is_open(self, key: str) -> bool:
+        """آیا مقصد به دلیل خطاهای پیاپی موقتاً مسدود است؟"""
+        return self._circuit.get(key, 0) > time.monotonic()
+    
+    def _circuit_record(self, key: str, success: bool):
+        """ثبت نتیجه ارسال؛ در خطا backoff دو برابر می‌شود (حداکثر 60 ثانیه)"""
+        if success:
+            if self._circuit_backoff.pop(key, None) is not None:
+                self._circuit.pop(key, None)
+            return
+        backoff = min(self._circuit_backoff.get(key, CIRCUIT_BASE_BACKOFF / 2) * 2, CIRCUIT_MAX_BACKOFF)
+        self._circuit_backoff[key] = backoff
+        self._circuit[key] = time.monotonic() + backoff
+    
+    def _now(self) -> datetime:
+        """زمان جاری (در تست‌ها قابل جایگزینی)"""
+        return datetime.now()
+    
+    async def send_telegram_notification(self, 
+                                         user_ids: List[int], 
+                                         message: str, 
+                                         priority: str = "normal",
+                                         _ts: Optional[datetime] = None) -> Dict:
+        """ارسال اطلاع‌رسانی تلگرام (ارسال همزمان به همه کاربران)"""
         results = {
             'sent': 0,
             'failed': 0,
@@ -36,32 +176,41 @@ class NotificationSystem:
         
         try:
             # اضافه کردن emoji بر اساس اولویت
-            priority_emojis = {
-                'low': '🔵',
-                'normal': '🟡',
-                'high': '🟠',
-                'critical': '🔴'
-            }
-            
-            formatted_message = f"{priority_emojis.get(priority, '🟡')} {message}"
+            formatted_message = f"{self.priority_emojis.get(priority, '🟡')} {message}"
             
+            # مقصدهای مسدود توسط circuit breaker ارسال نمی‌شوند
+            active_ids = []
             for user_id in user_ids:
-                try:
+                if self._circuit_is_open(f"telegram:{user_id}"):
+                    results['failed'] += 1
+                    results['errors'].append(f"User {user_id}: circuit_open")
+                else:
+                    active_ids.append(user_id)
+            
+            send_results = await asyncio.gather(
+                *[
                     self.telegram_bot.send_message(
                         chat_id=user_id,
                         text=formatted_message,
                         parse_mode='Markdown'
                     )
+                    for user_id in active_ids
+                ],
+                return_exceptions=True
+            )
+            
+            for user_id, send_result in zip(active_ids, send_results):
+                self._circuit_record(f"telegram:{user_id}", not isinstance(send_result, Exception))
+                if isinstance(send_result, Exception):
+                    results['failed'] += 1
+                    results['errors'].append(f"User {user_id}: {str(send_result)}")
+                    logger.error(f"Failed to send notification to {user_id}: {send_result}")
+                else:
                     results['sent'] += 1
                     logger.debug(f"Notification sent to {user_id}")
-                    
-                except TelegramError as e:
-                    results['failed'] += 1
-                    results['errors'].append(f"User {user_id}: {str(e)}")
-                    logger.error(f"Failed to send notification to {user_id}: {e}")
             
             # ثبت در تاریخچه
-            self._log_notification('telegram', message, priority, results)
+            self._log_notification('telegram', message, priority, results, _ts=_ts)
             
         except Exception as e:
             logger.error(f"Error in telegram notification: {e}")
@@ -69,11 +218,27 @@ class NotificationSystem:
         
         return results
     
+    def send_telegram_notification_sync(self, 
+                                        user_ids: List[int], 
+                                        message: str, 
+                                        priority: str = "normal",
+                                        _ts: Optional[datetime] = None) -> Dict:
+        """ارسال اطلاع‌رسانی تلگرام از کد همگام"""
+        return _run_coroutine(self.send_telegram_notification(user_ids, message, priority, _ts=_ts))
+    
+    async def send_telegram_notification_async(self, 
+                                               user_ids: List[int], 
+                                               message: str, 
+                                               priority: str = "normal") -> Dict:
+        """ارسال اطلاع‌رسانی تلگرام از داخل event loop دیگر (مثلاً handler ربات) روی loop اطلاع‌رسانی‌ها"""
+        return await _await_on_coro_loop(self.send_telegram_notification(user_ids, message, priority))
+    
     def send_email_notification(self, 
                                email_addresses: List[str], 
                                subject: str, 
                                message: str, 
-                               priority: str = "normal") -> Dict:
+                               priority: str = "normal",
+                               _ts: Optional[datetime] = None) -> Dict:
         """ارسال اطلاع‌رسانی ایمیل"""
         results = {
             'sent': 0,
@@ -86,51 +251,40 @@ class NotificationSystem:
             return results
         
         try:
+            ts = _ts or self._now()
+            
             # ایجاد پیام ایمیل
-            msg = MimeMultipart()
+            msg = MIMEMultipart()
             msg['From'] = self.email_config['username']
+            msg['To'] = 'undisclosed-recipients:;'
             msg['Subject'] = f"[FlowAI - {priority.upper()}] {subject}"
             
             # فرمت کردن پیام
-            html_message = f"""
-            <html>
-                <body>
-                    <h2>FlowAI Trading Bot Notification</h2>
-                    <p><strong>Priority:</strong> {priority.upper()}</p>
-                    <p><strong>Time:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                    <hr>
-                    <div>{message.replace('\n', '<br>')}</div>
-                    <hr>
-                    <p><small>This is an automated message from FlowAI Trading Bot</small></p>
-                </body>
-            </html>
-            """
-            
-            msg.attach(MimeText(html_message, 'html'))
-            
-            # اتصال به سرور SMTP
-            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-            server.starttls()
-            server.login(self.email_config['username'], self.email_config['password'])
+            html_message = _EMAIL_TMPL.format_map({
+                'priority': priority.upper(),
+                'ts': ts.strftime('%Y-%m-%d %H:%M:%S'),
+                'message_html': message.translate(_BR_TABLE)
+            })
+            
+            msg.attach(MIMEText(html_message, 'html'))
+            
+            # ارسال به همه ایمیل‌ها در یک تراکنش SMTP
+            try:
+                refused = self._send_mail(email_addresses, msg.as_string())
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
             
-            # ارسال به هر ایمیل
             for email in email_addresses:
-                try:
-                    msg['To'] = email
-                    text = msg.as_string()
-                    server.sendmail(self.email_config['username'], email, text)
+                if email in refused:
+                    results['failed'] += 1
+                    results['errors'].append(f"Email {email}: {refused[email]}")
+                    logger.error(f"Failed to send email to {email}: {refused[email]}")
+                else:
                     results['sent'] += 1
                     logger.debug(f"Email sent to {email}")
-                    
-                except Exception as e:
-                    results['failed'] += 1
-                    results['errors'].append(f"Email {email}: {str(e)}")
-                    logger.error(f"Failed to send email to {email}: {e}")
-            
-            server.quit()
             
             # ثبت در تاریخچه
-            self._log_notification('email', f"{subject}: {message}", priority, results)
+            self._log_notification('email', f"{subject}: {message}", priority, results, _ts=ts)
             
         except Exception as e:
             logger.error(f"Error in email notification: {e}")
@@ -138,10 +292,45 @@ class NotificationSystem:
         
         return results
     
+    def _get_smtp(self) -> smtplib.SMTP:
+        """دریافت اتصال SMTP ماندگار (در صورت نبود، ایجاد و login؛ فقط با _smtp_lock)"""
+        if self._smtp is None:
+            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
+            server.starttls()
+            server.login(self.email_config['username'], self.email_config['password'])
+            self._smtp = server
+        return self._smtp
+    
+    def _close_smtp(self):
+        """بستن اتصال SMTP ماندگار (فقط با _smtp_lock)"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+    
+    def _send_mail(self, email_addresses: List[str], text: str) -> Dict:
+        """ارسال ایمیل روی اتصال ماندگار؛ در صورت قطع اتصال یک بار دوباره تلاش می‌کند"""
+        # دریافت، ارسال و بستن/اتصال دوباره یک واحد هستند تا thread دیگری وسط آن اتصال را عوض نکند
+        with self._smtp_lock:
+            for attempt in range(2):
+                server = self._get_smtp()
+                try:
+                    return server.sendmail(self.email_config['username'], email_addresses, text)
+                except smtplib.SMTPRecipientsRefused:
+                    raise
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPException):
+                    self._close_smtp()
+                    if attempt:
+                        raise
+                    logger.warning("SMTP connection lost, reconnecting")
+    
     def send_webhook_notification(self, 
                                 webhook_url: str, 
                                 data: Dict, 
-                                priority: str = "normal") -> Dict:
+                                priority: str = "normal",
+                                _ts: Optional[datetime] = None) -> Dict:
         """ارسال اطلاع‌رسانی webhook"""
         results = {
             'sent': 0,
@@ -149,21 +338,21 @@ class NotificationSystem:
             'errors': []
         }
         
+        circuit_key = f"webhook:{webhook_url}"
+        if self._circuit_is_open(circuit_key):
+            results['failed'] = 1
+            results['errors'].append('circuit_open')
+            return results
+        
         try:
-            # اضافه کردن metadata
-            payload = {
-                'timestamp': datetime.now().isoformat(),
-                'priority': priority,
-                'source': 'FlowAI_Trading_Bot',
-                'data': data
-            }
-            
-            response = requests.post(
+            ts = _ts or self._now()
+            response = _HTTP.post(
                 webhook_url,
-                json=payload,
-                timeout=10,
+                data=self._build_webhook_payload(data, priority, ts),
+                timeout=(2, 5),
                 headers={'Content-Type': 'application/json'}
             )
+            self._circuit_record(circuit_key, response.status_code == 200)
             
             if response.status_code == 200:
                 results['sent'] = 1
@@ -174,20 +363,90 @@ class NotificationSystem:
                 logger.error(f"Webhook failed: {response.status_code}")
             
             # ثبت در تاریخچه
-            self._log_notification('webhook', str(data), priority, results)
+            self._log_notification('webhook', str(data), priority, results, _ts=ts)
             
         except Exception as e:
+            self._circuit_record(circuit_key, False)
             results['failed'] = 1
             results['errors'].append(f"System error: {str(e)}")
             logger.error(f"Error in webhook notification: {e}")
         
         return results
     
+    def _build_webhook_payload(self, data: Dict, priority: str, ts: datetime) -> bytes:
+        """ساخت و سریال‌سازی payload وب‌هوک (اضافه کردن metadata)"""
+        payload = {
+            'timestamp': ts,
+            'priority': priority,
+            'source': 'FlowAI_Trading_Bot',
+            'data': data
+        }
+        return _dumps(payload)
+    
+    async def _post_webhooks_async(self, 
+                                   webhook_urls: List[str], 
+                                   data: Dict, 
+                                   priority: str = "normal",
+                                   _ts: Optional[datetime] = None) -> List[Dict]:
+        """ارسال همزمان یک payload به چند webhook"""
+        ts = _ts or self._now()
+        payload_bytes = self._build_webhook_payload(data, priority, ts)
+        
+        # مقصدهای مسدود توسط circuit breaker ارسال نمی‌شوند
+        blocked = [self._circuit_is_open(f"webhook:{url}") for url in webhook_urls]
+        active_urls = [url for url, is_blocked in zip(webhook_urls, blocked) if not is_blocked]
+        
+        responses = []
+        if active_urls:
+            client = _get_webhook_client()
+            responses = await asyncio.gather(
+                *[
+                    client.post(url, content=payload_bytes, headers={'Content-Type': 'application/json'})
+                    for url in active_urls
+                ],
+                return_exceptions=True
+            )
+        
+        webhook_results = []
+        responses_iter = iter(responses)
+        for webhook_url, is_blocked in zip(webhook_urls, blocked):
+            results = {'sent': 0, 'failed': 0, 'errors': []}
+            
+            if is_blocked:
+                results['failed'] = 1
+                results['errors'].append('circuit_open')
+                webhook_results.append(results)
+                continue
+            
+            response = next(responses_iter)
+            self._circuit_record(
+                f"webhook:{webhook_url}",
+                not isinstance(response, Exception) and response.status_code == 200
+            )
+            
+            if isinstance(response, Exception):
+                results['failed'] = 1
+                results['errors'].append(f"System error: {str(response)}")
+                logger.error(f"Error in webhook notification: {response}")
+            elif response.status_code == 200:
+                results['sent'] = 1
+                logger.debug(f"Webhook sent successfully to {webhook_url}")
+            else:
+                results['failed'] = 1
+                results['errors'].append(f"HTTP {response.status_code}: {response.text}")
+                logger.error(f"Webhook failed: {response.status_code}")
+            
+            # ثبت در تاریخچه
+            self._log_notification('webhook', str(data), priority, results, _ts=ts)
+            webhook_results.append(results)
+        
+        return webhook_results
+    
     def send_multi_channel_notification(self, 
                                       message: str, 
                                       channels: Dict, 
                                       priority: str = "normal") -> Dict:
-        """ارسال اطلاع‌رسانی چند کاناله"""
+        """ارسال اطلاع‌رسانی چند کاناله (از کد همگام)"""
         results = {
             'telegram': {'sent': 0, 'failed': 0, 'errors': []},
             'email': {'sent': 0, 'failed': 0, 'errors': []},
@@ -197,10 +456,13 @@ class NotificationSystem:
         }
         
         try:
+            # یک زمان مشترک برای ثبت همه کانال‌های این رویداد
+            ts = self._now()
+            
             # ارسال تلگرام
             if 'telegram' in channels and channels['telegram']:
-                telegram_result = self.send_telegram_notification(
-                    channels['telegram'], message, priority
+                telegram_result = self.send_telegram_notification_sync(
+                    channels['telegram'], message, priority, _ts=ts
                 )
                 results['telegram'] = telegram_result
                 results['total_sent'] += telegram_result['sent']
@@ -212,7 +474,8 @@ class NotificationSystem:
                     channels['email']['addresses'], 
                     channels['email']['subject'], 
                     message, 
-                    priority
+                    priority,
+                    _ts=ts
                 )
                 results['email'] = email_result
                 results['total_sent'] += email_result['sent']
@@ -220,10 +483,11 @@ class NotificationSystem:
             
             # ارسال webhook
             if 'webhook' in channels and channels['webhook']:
-                for webhook_url in channels['webhook']:
-                    webhook_result = self.send_webhook_notification(
-                        webhook_url, {'message': message}, priority
-                    )
+                webhook_results = _run_coroutine(
+                    self._post_webhooks_async(list(channels['webhook']), {'message': message}, priority, _ts=ts)
+                )
+                
+                for webhook_result in webhook_results:
                     results['webhook']['sent'] += webhook_result['sent']
                     results['webhook']['failed'] += webhook_result['failed']
                     results['webhook']['errors'].extend(webhook_result['errors'])
@@ -238,50 +502,93 @@ class NotificationSystem:
         
         return results
     
+    async def send_multi_channel_notification_async(self, 
+                                                    message: str, 
+                                                    channels: Dict, 
+                                                    priority: str = "normal") -> Dict:
+        """ارسال اطلاع‌رسانی چند کاناله از داخل event loop (ایمیل blocking است؛ کل ارسال در executor اجرا می‌شود)"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.send_multi_channel_notification, message, channels, priority
+        )
+    
+    async def _close_clients(self):
+        """بستن client webhook و اتصال‌های ربات (روی loop اطلاع‌رسانی‌ها)"""
+        global _webhook_client
+        if _webhook_client is not None:
+            await _webhook_client.aclose()
+            _webhook_client = None
+        await self.telegram_bot.shutdown()
+    
+    async def close(self):
+        """بستن اتصال‌های ماندگار اطلاع‌رسانی (هنگام خاموش شدن ربات)"""
+        if _coro_loop is None:
+            return
+        try:
+            await _await_on_coro_loop(self._close_clients())
+        except Exception as e:
+            logger.error(f"Error closing notification clients: {e}")
+    
+    def refresh_recipients(self):
+        """بارگذاری مجدد مخاطبان هشدارهای سیستم"""
+        self._admin_ids = tuple(TELEGRAM_ADMIN_IDS)
+        # import دیرهنگام: signal_manager کل موتور سیگنال را بارگذاری می‌کند
+        from .telegram.signal_manager import signal_manager
+        # مجموعه‌های زنده مشترکین (با اضافه/حذف کاربر به‌روز می‌مانند)
+        self._alert_subscribers = (signal_manager.subscribers['admin'], signal_manager.subscribers['premium'])
+    
     def send_system_alert(self, 
                          alert_type: str, 
                          message: str, 
                          admin_only: bool = True) -> Dict:
-        """ارسال هشدار سیستم"""
+        """ارسال هشدار سیستم (از کد همگام)"""
+        return _run_coroutine(self._send_system_alert(alert_type, message, admin_only))
+    
+    async def send_system_alert_async(self, 
+                                      alert_type: str, 
+                                      message: str, 
+                                      admin_only: bool = True) -> Dict:
+        """ارسال هشدار سیستم از داخل event loop دیگر (مثلاً handler ربات)"""
+        return await _await_on_coro_loop(self._send_system_alert(alert_type, message, admin_only))
+    
+    async def _send_system_alert(self, alert_type: str, message: str, admin_only: bool) -> Dict:
+        """فرمت و ارسال هشدار سیستم (روی loop اطلاع‌رسانی‌ها اجرا می‌شود)"""
         try:
             priority = 'critical' if alert_type in ['error', 'critical'] else 'high'
             
+            ts = self._now()
+            
             # فرمت کردن پیام هشدار
-            alert_message = f"""
-🚨 **هشدار سیستم FlowAI**
-
-🔸 **نوع:** {alert_type.upper()}
-🔸 **زمان:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-📝 **پیام:**
-{message}
-
-⚠️ این هشدار نیاز به بررسی فوری دارد.
-"""
+            alert_message = _ALERT_TMPL.format_map({
+                'alert_type': alert_type.upper(),
+                'ts': ts.strftime('%Y-%m-%d %H:%M:%S'),
+                'message': message
+            })
             
             # تعیین مخاطبان
             if admin_only:
-                from .config import TELEGRAM_ADMIN_IDS
-                recipients = TELEGRAM_ADMIN_IDS
+                recipients = self._admin_ids
             else:
-                from .telegram.signal_manager import signal_manager
-                recipients = list(signal_manager.subscribers['admin']) + list(signal_manager.subscribers['premium'])
+                if self._alert_subscribers is None:
+                    self.refresh_recipients()
+                admin_subs, premium_subs = self._alert_subscribers
+                recipients = [*admin_subs, *premium_subs]
             
             # ارسال هشدار
-            result = self.send_telegram_notification(recipients, alert_message, priority)
+            result = await self.send_telegram_notification(recipients, alert_message, priority, _ts=ts)
             
-            logger.warning(f"System alert sent: {alert_type} - {message}")
+            logger.warning(f"System alert sent: {alert_type} - {message} ({result['sent']} sent, {result['failed']} failed)")
             return result
             
         except Exception as e:
             logger.error(f"Error sending system alert: {e}")
             return {'sent': 0, 'failed': 1, 'errors': [str(e)]}
     
-    def _log_notification(self, channel: str, message: str, priority: str, results: Dict):
+    def _log_notification(self, channel: str, message: str, priority: str, results: Dict,
+                          _ts: Optional[datetime] = None):
         """ثبت اطلاع‌رسانی در تاریخچه"""
         try:
             log_entry = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': (_ts or self._now()).isoformat(),
                 'channel': channel,
                 'message': message[:100] + '...' if len(message) > 100 else message,
                 'priority': priority,
@@ -290,62 +597,56 @@ class NotificationSystem:
                 'success_rate': results['sent'] / (results['sent'] + results['failed']) if (results['sent'] + results['failed']) > 0 else 0
             }
             
-            self.notification_history.append(log_entry)
+            with self._stats_lock:
+                # رکوردی که از deque بیرون می‌رود از آمار کم می‌شود
+                if len(self.notification_history) == self.notification_history.maxlen:
+                    self._update_statistics(self.notification_history[0], -1)
+                self.notification_history.append(log_entry)
+                self._update_statistics(log_entry, 1)
             
-            # نگهداری آخرین 1000 رکورد
-            if len(self.notification_history) > 1000:
-                self.notification_history.pop(0)
-                
         except Exception as e:
             logger.error(f"Error logging notification: {e}")
     
+    def _update_statistics(self, log_entry: Dict, sign: int):
+        """اعمال (sign=1) یا حذف (sign=-1) یک رکورد در آمار تجمعی"""
+        self._stats_total_sent += sign * log_entry['sent']
+        self._stats_total_failed += sign * log_entry['failed']
+        
+        for breakdown, key in ((self._channel_stats, log_entry['channel']),
+                               (self._priority_stats, log_entry['priority'])):
+            bucket = breakdown.setdefault(key, {'count': 0, 'sent': 0, 'failed': 0})
+            bucket['count'] += sign
+            bucket['sent'] += sign * log_entry['sent']
+            bucket['failed'] += sign * log_entry['failed']
+            if bucket['count'] == 0:
+                del breakdown[key]
+    
     def get_notification_statistics(self) -> Dict:
         """دریافت آمار اطلاع‌رسانی‌ها"""
         try:
-            if not self.notification_history:
-                return {
-                    'total_notifications': 0,
-                    'success_rate': 0,
-                    'channel_breakdown': {},
-                    'priority_breakdown': {}
-                }
-            
-            total = len(self.notification_history)
-            total_sent = sum(n['sent'] for n in self.notification_history)
-            total_failed = sum(n['failed'] for n in self.notification_history)
-            success_rate = total_sent / (total_sent + total_failed) if (total_sent + total_failed) > 0 else 0
-            
-            # تفکیک بر اساس کانال
-            channel_breakdown = {}
-            for notification in self.notification_history:
-                channel = notification['channel']
-                if channel not in channel_breakdown:
-                    channel_breakdown[channel] = {'count': 0, 'sent': 0, 'failed': 0}
+            with self._stats_lock:
+                if not self.notification_history:
+                    return {
+                        'total_notifications': 0,
+                        'success_rate': 0,
+                        'channel_breakdown': {},
+                        'priority_breakdown': {}
+                    }
                 
-                channel_breakdown[channel]['count'] += 1
-                channel_breakdown[channel]['sent'] += notification['sent']
-                channel_breakdown[channel]['failed'] += notification['failed']
-            
-            # تفکیک بر اساس اولویت
-            priority_breakdown = {}
-            for notification in self.notification_history:
-                priority = notification['priority']
-                if priority not in priority_breakdown:
-                    priority_breakdown[priority] = {'count': 0, 'sent': 0, 'failed': 0}
+                total = len(self.notification_history)
+                total_sent = self._stats_total_sent
+                total_failed = self._stats_total_failed
+                success_rate = total_sent / (total_sent + total_failed) if (total_sent + total_failed) > 0 else 0
                 
-                priority_breakdown[priority]['count'] += 1
-                priority_breakdown[priority]['sent'] += notification['sent']
-                priority_breakdown[priority]['failed'] += notification['failed']
-            
-            return {
-                'total_notifications': total,
-                'total_sent': total_sent,
-                'total_failed': total_failed,
-                'success_rate': success_rate,
-                'channel_breakdown': channel_breakdown,
-                'priority_breakdown': priority_breakdown,
-                'recent_notifications': self.notification_history[-10:]  # آخرین 10 مورد
-            }
+                return {
+                    'total_notifications': total,
+                    'total_sent': total_sent,
+                    'total_failed': total_failed,
+                    'success_rate': success_rate,
+                    'channel_breakdown': {k: dict(v) for k, v in self._channel_stats.items()},
+                    'priority_breakdown': {k: dict(v) for k, v in self._priority_stats.items()},
+                    'recent_notifications': list(islice(self.notification_history, max(0, total - 10), None))  # آخرین 10 مورد
+                }
             
         except Exception as e:
             logger.error(f"Error getting notification statistics: {e}")
@@ -356,7 +657,7 @@ notification_system = NotificationSystem()
 
 def send_telegram_alert(user_ids: List[int], message: str, priority: str = "normal") -> Dict:
     """ارسال هشدار تلگرام"""
-    return notification_system.send_telegram_notification(user_ids, message, priority)
+    return notification_system.send_telegram_notification_sync(user_ids, message, priority)
 
 def send_system_alert(alert_type: str, message: str, admin_only: bool = True) -> Dict:
     """ارسال هشدار سیستم"""
@@ -366,6 +667,18 @@ def send_multi_channel_alert(message: str, channels: Dict, priority: str = "norm
     """ارسال هشدار چند کاناله"""
     return notification_system.send_multi_channel_notification(message, channels, priority)
 
+async def send_telegram_alert_async(user_ids: List[int], message: str, priority: str = "normal") -> Dict:
+    """ارسال هشدار تلگرام از داخل event loop"""
+    return await notification_system.send_telegram_notification_async(user_ids, message, priority)
+
+async def send_system_alert_async(alert_type: str, message: str, admin_only: bool = True) -> Dict:
+    """ارسال هشدار سیستم از داخل event loop"""
+    return await notification_system.send_system_alert_async(alert_type, message, admin_only)
+
+async def send_multi_channel_alert_async(message: str, channels: Dict, priority: str = "normal") -> Dict:
+    """ارسال هشدار چند کاناله از داخل event loop"""
+    return await notification_system.send_multi_channel_notification_async(message, channels, priority)
+
 def get_notification_stats() -> Dict:
     """دریافت آمار اطلاع‌رسانی‌ها"""
     return notification_system.get_notification_statistics()
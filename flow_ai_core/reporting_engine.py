@@ -1,20 +1,127 @@
 import pandas as pd
 import numpy as np
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import copy
+import glob
 import json
 import os
 from .backtest_engine import backtest_engine
 from .telegram.signal_manager import signal_manager
 from .risk_manager import risk_manager
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 logger = logging.getLogger(__name__)
 
+# سقف اندازه فایل NDJSON گزارش‌های روزانه؛ با رسیدن به آن فایل به daily.ndjson.1 منتقل می‌شود
+DAILY_LOG_MAX_BYTES = 16 * 1024 * 1024
+
+# ستون‌های فایل خلاصه روزانه که گزارش هفتگی از آن‌ها استفاده می‌کند
+DAILY_SUMMARY_COLUMNS = ['date', 'total_signals', 'buy_signals', 'sell_signals', 'avg_confidence', 'daily_pnl']
+
+# مسیر هر ستون خلاصه در گزارش روزانه (خروجی json_normalize)
+_SUMMARY_SOURCES = {
+    'signal_statistics.total_signals': 'total_signals',
+    'signal_statistics.buy_signals': 'buy_signals',
+    'signal_statistics.sell_signals': 'sell_signals',
+    'signal_statistics.avg_confidence': 'avg_confidence',
+    'risk_statistics.daily_pnl': 'daily_pnl'
+}
+_SUMMARY_DTYPES = {
+    'total_signals': 'int64',
+    'buy_signals': 'int64',
+    'sell_signals': 'int64',
+    'avg_confidence': 'float64',
+    'daily_pnl': 'float64'
+}
+
+# گزارش‌های روزانه قدیمی (یک فایل JSON برای هر روز) که یک بار به فایل خلاصه منتقل می‌شوند
+_LEGACY_DAILY_GLOB = "daily_report_*.json"
+
+# قالب‌های متنی گزارش‌ها (یک بار در سطح ماژول تعریف می‌شوند و با format_map پر می‌شوند)
+_DAILY_REPORT_TMPL = """
+📊 **گزارش روزانه FlowAI**
+📅 تاریخ: {date}
+
+🚨 **آمار سیگنال‌ها:**
+🔹 کل سیگنال‌ها: {total_signals}
+🔹 سیگنال‌های خرید: {buy_signals}
+🔹 سیگنال‌های فروش: {sell_signals}
+🔹 میانگین اعتماد: {avg_confidence:.1%}
+
+⚠️ **آمار ریسک:**
+🔹 PnL روزانه: ${daily_pnl:.2f}
+🔹 تعداد معاملات: {daily_trades}
+🔹 نرخ برد اخیر: {recent_win_rate:.1f}%
+
+🤖 **وضعیت سیستم:**
+🔹 نظارت فعال: {monitoring}
+🔹 کاربران پریمیوم: {premium_users}
+🔹 کاربران رایگان: {free_users}
+
+⏰ آخرین به‌روزرسانی: {now:%Y-%m-%d %H:%M:%S}
+"""
+
+_WEEKLY_REPORT_TMPL = """
+📈 **گزارش هفتگی FlowAI**
+📅 هفته: {week_start} تا {week_end}
+
+📊 **خلاصه هفتگی:**
+🔹 کل سیگنال‌ها: {total_signals}
+🔹 میانگین روزانه: {daily_average:.1f}
+🔹 میانگین اعتماد: {avg_confidence:.1%}
+
+💰 **عملکرد مالی:**
+🔹 PnL کل: ${total_pnl:.2f}
+🔹 روزهای سودآور: {profitable_days}
+🔹 روزهای ضررده: {losing_days}
+
+📈 **روندها:**
+🔹 روند سیگنال‌ها: {signal_count_trend}
+🔹 روند اعتماد: {confidence_trend}
+🔹 امتیاز ثبات: {consistency_score:.1%}
+
+💡 **توصیه‌ها:**
+"""
+
+def _json_default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _mean_std(values: np.ndarray) -> Tuple[float, float]:
+    """میانگین و انحراف معیار (جمعیتی) با یک بار محاسبه میانگین"""
+    mean = values.mean()
+    deviations = values - mean
+    return float(mean), float(np.sqrt(np.dot(deviations, deviations) / len(values)))
+
 class ReportingEngine:
     def __init__(self):
         self.reports_dir = "reports"
+        self.daily_log_file = os.path.join(self.reports_dir, "daily.ndjson")
+        self.rolling_summary_file = os.path.join(self.reports_dir, "rolling_summary.parquet")
+        # کش آمار هفتگی بر اساس (بازه، mtime و اندازه فایل خلاصه)
+        self._weekly_cache: Dict[Tuple, Tuple[int, Dict, Dict]] = {}
+        self._weekly_cache_size = 4
         self.ensure_reports_directory()
+        try:
+            self._import_legacy_reports()
+        except Exception as e:
+            logger.error(f"Error importing legacy daily reports: {e}")
+        # تاریخ و offset سطر آخر فایل NDJSON (هر تاریخ یک سطر دارد که با گزارش جدیدتر بازنویسی می‌شود)
+        self._logged_date, self._logged_offset = self._last_logged_entry()
         
     def ensure_reports_directory(self):
         """اطمینان از وجود پوشه گزارش‌ها"""
@@ -48,12 +155,19 @@ class ReportingEngine:
                 'performance_metrics': self._calculate_performance_metrics()
             }
             
-            # ذخیره گزارش
-            filename = f"{self.reports_dir}/daily_report_{today.strftime('%Y%m%d')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+            # ذخیره گزارش به صورت یک سطر در فایل NDJSON روزانه (آخرین گزارش هر تاریخ جایگزین سطر همان تاریخ می‌شود)
+            replace_from = self._logged_offset if report['date'] == self._logged_date else None
+            self._logged_offset = self._append_ndjson(self.daily_log_file, report, replace_from)
+            self._logged_date = report['date']
+            
+            # ذخیره خلاصه عددی برای گزارش هفتگی (خطا در گزارش برگردانده می‌شود)
+            try:
+                self._append_daily_summary(report, today)
+            except Exception as e:
+                logger.error(f"Error writing daily summary: {e}")
+                report['summary_error'] = str(e)
             
-            logger.info(f"Daily report generated: {filename}")
+            logger.info(f"Daily report generated: {self.daily_log_file}")
             return report
             
         except Exception as e:
@@ -66,36 +180,30 @@ class ReportingEngine:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=7)
             
-            # جمع‌آوری گزارش‌های روزانه
-            daily_reports = []
-            for i in range(7):
-                date = start_date + timedelta(days=i)
-                filename = f"{self.reports_dir}/daily_report_{date.strftime('%Y%m%d')}.json"
-                
-                if os.path.exists(filename):
-                    try:
-                        with open(filename, 'r', encoding='utf-8') as f:
-                            daily_reports.append(json.load(f))
-                    except Exception as e:
-                        logger.warning(f"Could not load daily report {filename}: {e}")
-            
-            # تجمیع آمار هفتگی
-            weekly_stats = self._aggregate_weekly_stats(daily_reports)
+            # تجمیع آمار هفتگی (7 روز قبل از امروز)؛ نبود فایل خلاصه به جای آمار صفر به صورت خطا گزارش می‌شود
+            try:
+                daily_count, weekly_stats, trends = self._get_weekly_aggregates(start_date, end_date)
+                summary_error = None
+            except Exception as e:
+                logger.error(f"Could not load daily summary {self.rolling_summary_file}: {e}")
+                daily_count, weekly_stats, trends = 0, {}, {}
+                summary_error = str(e)
             
             report = {
                 'week_start': start_date.isoformat(),
                 'week_end': end_date.isoformat(),
                 'timestamp': datetime.now().isoformat(),
-                'daily_reports_count': len(daily_reports),
+                'daily_reports_count': daily_count,
                 'weekly_statistics': weekly_stats,
-                'trends': self._analyze_weekly_trends(daily_reports),
-                'recommendations': self._generate_recommendations(weekly_stats)
+                'trends': trends,
+                'recommendations': [] if summary_error else self._generate_recommendations(weekly_stats)
             }
+            if summary_error:
+                report['summary_error'] = summary_error
             
             # ذخیره گزارش هفتگی
             filename = f"{self.reports_dir}/weekly_report_{end_date.strftime('%Y%m%d')}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+            self._write_json(filename, report)
             
             logger.info(f"Weekly report generated: {filename}")
             return report
@@ -104,36 +212,177 @@ class ReportingEngine:
             logger.error(f"Error generating weekly report: {e}")
             return {}
     
+    def _get_weekly_aggregates(self, start_date, end_date) -> Tuple[int, Dict, Dict]:
+        """آمار و روندهای هفتگی؛ تا وقتی فایل خلاصه تغییر نکرده از کش برگردانده می‌شود"""
+        try:
+            stat = os.stat(self.rolling_summary_file)
+            key = (start_date, end_date, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            key = (start_date, end_date, None, None)
+        
+        cached = self._weekly_cache.get(key)
+        if cached is None:
+            # جمع‌آوری خلاصه‌های روزانه از فایل خلاصه
+            daily_df = self._load_daily_summary(start_date, end_date)
+            cached = (len(daily_df), self._aggregate_weekly_stats(daily_df), self._analyze_weekly_trends(daily_df))
+            
+            if len(self._weekly_cache) >= self._weekly_cache_size:
+                self._weekly_cache.pop(next(iter(self._weekly_cache)))
+            self._weekly_cache[key] = cached
+        
+        daily_count, weekly_stats, trends = cached
+        return daily_count, copy.deepcopy(weekly_stats), copy.deepcopy(trends)
+    
+    def _write_json(self, filename: str, report: Dict) -> None:
+        """سریال‌سازی کامل گزارش در حافظه (با orjson در صورت نصب بودن) و نوشتن آن با یک write بافر شده"""
+        if orjson:
+            data = orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            data = json.dumps(report, ensure_ascii=False, indent=2, default=_json_default).encode('utf-8')
+        with open(filename, 'wb', buffering=1024 * 1024) as f:
+            f.write(data)
+    
+    def _last_logged_entry(self) -> Tuple[Optional[str], Optional[int]]:
+        """تاریخ و offset شروع سطر آخر فایل NDJSON روزانه (فقط انتهای فایل خوانده می‌شود)"""
+        try:
+            with open(self.daily_log_file, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                start = max(0, f.tell() - 65536)
+                f.seek(start)
+                tail = f.read().rstrip(b'\n')
+            newline = tail.rfind(b'\n')
+            if not tail or (newline < 0 and start > 0):
+                # فایل خالی یا سطر آخر بزرگ‌تر از بخش خوانده شده
+                return None, None
+            line = tail[newline + 1:]
+            entry = orjson.loads(line) if orjson else json.loads(line)
+            return entry.get('date'), start + newline + 1
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning(f"Could not read last entry of {self.daily_log_file}: {e}")
+            return None, None
+    
+    def _append_ndjson(self, filename: str, report: Dict, replace_from: Optional[int] = None) -> int:
+        """افزودن گزارش به صورت یک سطر JSON به انتهای فایل و برگرداندن offset شروع آن سطر
+        
+        با replace_from فایل از آن offset کوتاه و سطر آخر بازنویسی می‌شود؛ در غیر این صورت
+        با رسیدن به DAILY_LOG_MAX_BYTES فایل چرخانده می‌شود.
+        """
+        if replace_from is None and os.path.exists(filename) and os.path.getsize(filename) >= DAILY_LOG_MAX_BYTES:
+            os.replace(filename, filename + '.1')
+        
+        if orjson:
+            line = orjson.dumps(report, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+        else:
+            line = (json.dumps(report, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+        with open(filename, 'ab', buffering=1024 * 1024) as f:
+            end = f.seek(0, os.SEEK_END)
+            if replace_from is not None and replace_from <= end:
+                f.truncate(replace_from)
+                end = f.seek(replace_from)
+            f.write(line)
+        return end
+    
+    def _summary_row(self, report: Dict, day) -> pd.DataFrame:
+        """سطر خلاصه عددی یک گزارش روزانه"""
+        # یک بار مسطح‌سازی و انتخاب ستون‌های عددی (مقادیر ناموجود = 0)
+        flat = pd.json_normalize({
+            'signal_statistics': report.get('signal_statistics', {}),
+            'risk_statistics': report.get('risk_statistics', {})
+        })
+        row = (flat.reindex(columns=list(_SUMMARY_SOURCES))
+                   .rename(columns=_SUMMARY_SOURCES)
+                   .fillna(0)
+                   .astype(_SUMMARY_DTYPES))
+        row.insert(0, 'date', pd.Timestamp(day))
+        return row
+    
+    def _write_summary_rows(self, rows: pd.DataFrame, replace: bool = True) -> None:
+        """ادغام سطرها با فایل خلاصه (یک سطر برای هر روز؛ replace=False سطرهای موجود را نگه می‌دارد)"""
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is not installed; daily summaries cannot be stored")
+        
+        if os.path.exists(self.rolling_summary_file):
+            summary = pd.read_parquet(self.rolling_summary_file, engine='pyarrow')
+            rows = (pd.concat([summary, rows], ignore_index=True)
+                      .drop_duplicates('date', keep='last' if replace else 'first'))
+        
+        rows.sort_values('date', ignore_index=True).to_parquet(
+            self.rolling_summary_file, engine='pyarrow', compression='snappy', index=False
+        )
+    
+    def _append_daily_summary(self, report: Dict, day) -> None:
+        """افزودن خلاصه عددی گزارش روزانه به فایل خلاصه (بازتولید گزارش یک روز سطر همان روز را جایگزین می‌کند)"""
+        self._write_summary_rows(self._summary_row(report, day))
+    
+    def _import_legacy_reports(self) -> None:
+        """انتقال یک‌باره daily_report_*.json های قدیمی به فایل خلاصه"""
+        legacy_files = sorted(glob.glob(os.path.join(self.reports_dir, _LEGACY_DAILY_GLOB)))
+        if not legacy_files:
+            return
+        
+        rows = []
+        for filename in legacy_files:
+            with open(filename, 'rb') as f:
+                raw = f.read()
+            report = orjson.loads(raw) if orjson else json.loads(raw)
+            day = report.get('date') or datetime.strptime(os.path.basename(filename)[13:21], '%Y%m%d').date()
+            rows.append(self._summary_row(report, day))
+        
+        # سطرهای موجود در فایل خلاصه جدیدتر از گزارش‌های قدیمی هستند و حفظ می‌شوند
+        self._write_summary_rows(pd.concat(rows, ignore_index=True), replace=False)
+        
+        for filename in legacy_files:
+            os.replace(filename, filename + ".migrated")
+        logger.info(f"Migrated {len(legacy_files)} daily reports to {self.rolling_summary_file}")
+    
+    def _load_daily_summary(self, start_date, end_date) -> pd.DataFrame:
+        """خواندن خلاصه‌های روزانه در بازه [start_date, end_date) از فایل خلاصه (خطای خواندن به caller می‌رسد)"""
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is not installed; daily summaries are unavailable")
+        
+        if not os.path.exists(self.rolling_summary_file):
+            return pd.DataFrame(columns=DAILY_SUMMARY_COLUMNS)
+        
+        return pd.read_parquet(
+            self.rolling_summary_file,
+            engine='pyarrow',
+            columns=DAILY_SUMMARY_COLUMNS,
+            filters=[('date', '>=', pd.Timestamp(start_date)), ('date', '<', pd.Timestamp(end_date))]
+        )
+    
     def _get_system_status(self) -> Dict:
         """دریافت وضعیت سیستم"""
         return {
             'signal_monitoring_active': signal_manager.running,
             'api_status': 'active',  # باید از BrsAPI بررسی شود
-            'last_signal_time': signal_manager.signal_history[-1]['sent_time'].isoformat() if signal_manager.signal_history else None,
-            'subscribers_count': {
-                'admin': len(signal_manager.subscribers['admin']),
-                'premium': len(signal_manager.subscribers['premium']),
-                'free': len(signal_manager.subscribers['free'])
-            }
+            'last_signal_time': signal_manager.last_signal_iso,
+            'subscribers_count': signal_manager.subscriber_counts()
         }
     
     def _calculate_performance_metrics(self) -> Dict:
         """محاسبه متریک‌های عملکرد"""
         try:
             # متریک‌های سیگنال
-            if signal_manager.signal_history:
-                signals = [s['signal'] for s in signal_manager.signal_history]
+            signals_df = signal_manager.signal_frame()
+            if len(signals_df):
+                # محاسبه روی ستون‌های پیوسته تاریخچه سیگنال‌ها
+                total_signals = len(signals_df)
+                action_counts = signals_df['action'].value_counts()
+                conf = signals_df['confidence'].to_numpy()
                 
-                total_signals = len(signals)
-                buy_signals = len([s for s in signals if s['action'] == 'BUY'])
-                sell_signals = len([s for s in signals if s['action'] == 'SELL'])
-                avg_confidence = np.mean([s['confidence'] for s in signals])
+                buy_signals = int(action_counts['BUY'])
+                sell_signals = int(action_counts['SELL'])
+                avg_confidence = float(conf.mean())
                 
                 # محاسبه توزیع اعتماد
+                high_mask = conf >= 0.8
+                low_mask = conf < 0.6
                 confidence_distribution = {
-                    'high_confidence': len([s for s in signals if s['confidence'] >= 0.8]),
-                    'medium_confidence': len([s for s in signals if 0.6 <= s['confidence'] < 0.8]),
-                    'low_confidence': len([s for s in signals if s['confidence'] < 0.6])
+                    'high_confidence': int(high_mask.sum()),
+                    'medium_confidence': int(((conf >= 0.6) & ~high_mask).sum()),
+                    'low_confidence': int(low_mask.sum())
                 }
             else:
                 total_signals = buy_signals = sell_signals = 0
@@ -157,47 +406,43 @@ class ReportingEngine:
             logger.error(f"Error calculating performance metrics: {e}")
             return {}
     
-    def _aggregate_weekly_stats(self, daily_reports: List[Dict]) -> Dict:
+    def _aggregate_weekly_stats(self, daily_df: pd.DataFrame) -> Dict:
         """تجمیع آمار هفتگی"""
-        if not daily_reports:
+        if daily_df.empty:
             return {}
         
         try:
-            # تجمیع آمار سیگنال‌ها
-            total_signals = sum(r.get('signal_statistics', {}).get('total_signals', 0) for r in daily_reports)
-            total_buy = sum(r.get('signal_statistics', {}).get('buy_signals', 0) for r in daily_reports)
-            total_sell = sum(r.get('signal_statistics', {}).get('sell_signals', 0) for r in daily_reports)
+            days = len(daily_df)
             
-            # میانگین اعتماد
-            confidences = []
-            for r in daily_reports:
-                if r.get('signal_statistics', {}).get('avg_confidence'):
-                    confidences.append(r['signal_statistics']['avg_confidence'])
+            # تجمیع آمار سیگنال‌ها و ریسک با یک sum
+            totals = daily_df[['total_signals', 'buy_signals', 'sell_signals', 'daily_pnl']].sum()
+            total_signals = int(totals['total_signals'])
+            total_pnl = float(totals['daily_pnl'])
             
-            avg_confidence = np.mean(confidences) if confidences else 0
+            # میانگین اعتماد (فقط روزهایی که سیگنال داشته‌اند)
+            confidences = self._nonzero_confidences(daily_df)
+            avg_confidence = float(confidences.mean()) if len(confidences) else 0
             
-            # تجمیع آمار ریسک
-            daily_pnls = [r.get('risk_statistics', {}).get('daily_pnl', 0) for r in daily_reports]
-            total_pnl = sum(daily_pnls)
+            daily_pnls = daily_df['daily_pnl']
             
             return {
                 'signals': {
                     'total': total_signals,
-                    'buy': total_buy,
-                    'sell': total_sell,
-                    'daily_average': total_signals / len(daily_reports),
+                    'buy': int(totals['buy_signals']),
+                    'sell': int(totals['sell_signals']),
+                    'daily_average': total_signals / days,
                     'avg_confidence': avg_confidence
                 },
                 'risk': {
                     'total_pnl': total_pnl,
-                    'daily_average_pnl': total_pnl / len(daily_reports),
-                    'profitable_days': len([pnl for pnl in daily_pnls if pnl > 0]),
-                    'losing_days': len([pnl for pnl in daily_pnls if pnl < 0])
+                    'daily_average_pnl': total_pnl / days,
+                    'profitable_days': int((daily_pnls > 0).sum()),
+                    'losing_days': int((daily_pnls < 0).sum())
                 },
                 'system': {
-                    'active_days': len(daily_reports),
+                    'active_days': days,
                     'total_days': 7,
-                    'uptime_percentage': (len(daily_reports) / 7) * 100
+                    'uptime_percentage': (days / 7) * 100
                 }
             }
             
@@ -205,53 +450,72 @@ class ReportingEngine:
             logger.error(f"Error aggregating weekly stats: {e}")
             return {}
     
-    def _analyze_weekly_trends(self, daily_reports: List[Dict]) -> Dict:
+    def _nonzero_confidences(self, daily_df: pd.DataFrame) -> pd.Series:
+        """میانگین اعتماد روزهایی که مقدار معتبر دارند"""
+        confidences = daily_df['avg_confidence']
+        return confidences[confidences.notna() & (confidences != 0)]
+    
+    def _extract_matrix(self, daily_df: pd.DataFrame) -> np.ndarray:
+        """ماتریس (N,3) از تعداد سیگنال، میانگین اعتماد و PnL روزانه"""
+        return daily_df[['total_signals', 'avg_confidence', 'daily_pnl']].to_numpy(dtype=np.float64)
+    
+    def _analyze_weekly_trends(self, daily_df: pd.DataFrame) -> Dict:
         """تحلیل روندهای هفتگی"""
-        if len(daily_reports) < 2:
+        if len(daily_df) < 2:
             return {}
         
         try:
+            mat = self._extract_matrix(daily_df)
+            signal_counts, pnls = mat[:, 0], mat[:, 2]
+            
             # روند تعداد سیگنال‌ها
-            signal_counts = [r.get('signal_statistics', {}).get('total_signals', 0) for r in daily_reports]
             signal_trend = 'increasing' if signal_counts[-1] > signal_counts[0] else 'decreasing'
             
-            # روند اعتماد
-            confidences = [r.get('signal_statistics', {}).get('avg_confidence', 0) for r in daily_reports if r.get('signal_statistics', {}).get('avg_confidence')]
+            # روند اعتماد (فقط روزهایی که مقدار معتبر دارند)
+            confidences = mat[:, 1]
+            confidences = confidences[(confidences != 0) & ~np.isnan(confidences)]
             confidence_trend = 'improving' if len(confidences) >= 2 and confidences[-1] > confidences[0] else 'declining'
             
             # روند PnL
-            pnls = [r.get('risk_statistics', {}).get('daily_pnl', 0) for r in daily_reports]
             pnl_trend = 'improving' if pnls[-1] > pnls[0] else 'declining'
             
+            signal_mean, signal_std = _mean_std(signal_counts)
+            
             return {
                 'signal_count_trend': signal_trend,
                 'confidence_trend': confidence_trend,
                 'pnl_trend': pnl_trend,
-                'volatility': np.std(signal_counts) if signal_counts else 0,
-                'consistency_score': self._calculate_consistency_score(daily_reports)
+                'volatility': signal_std,
+                'consistency_score': self._calculate_consistency_score(signal_counts, confidences, signal_mean, signal_std)
             }
             
         except Exception as e:
             logger.error(f"Error analyzing weekly trends: {e}")
             return {}
     
-    def _calculate_consistency_score(self, daily_reports: List[Dict]) -> float:
+    def _calculate_consistency_score(self, 
+                                     signal_counts: np.ndarray, 
+                                     confidences: np.ndarray, 
+                                     signal_mean: float,
+                                     signal_std: float) -> float:
         """محاسبه امتیاز ثبات"""
         try:
-            if len(daily_reports) < 3:
+            if len(signal_counts) < 3:
                 return 0.5
             
             # بررسی ثبات در تولید سیگنال
-            signal_counts = [r.get('signal_statistics', {}).get('total_signals', 0) for r in daily_reports]
-            signal_consistency = 1 - (np.std(signal_counts) / max(np.mean(signal_counts), 1))
+            signal_consistency = 1 - (signal_std / max(signal_mean, 1))
             
             # بررسی ثبات در کیفیت سیگنال
-            confidences = [r.get('signal_statistics', {}).get('avg_confidence', 0) for r in daily_reports if r.get('signal_statistics', {}).get('avg_confidence')]
-            confidence_consistency = 1 - (np.std(confidences) / max(np.mean(confidences), 1)) if confidences else 0.5
+            if len(confidences):
+                confidence_mean, confidence_std = _mean_std(confidences)
+                confidence_consistency = 1 - (confidence_std / max(confidence_mean, 1))
+            else:
+                confidence_consistency = 0.5
             
             # امتیاز کلی
             consistency_score = (signal_consistency + confidence_consistency) / 2
-            return max(0, min(1, consistency_score))
+            return float(max(0, min(1, consistency_score)))
             
         except Exception as e:
             logger.error(f"Error calculating consistency score: {e}")
@@ -312,64 +576,54 @@ class ReportingEngine:
         signal_stats = report.get('signal_statistics', {})
         risk_stats = report.get('risk_statistics', {})
         system_status = report.get('system_status', {})
+        subscribers = system_status.get('subscribers_count', {})
         
-        text = f"""
-📊 **گزارش روزانه FlowAI**
-📅 تاریخ: {report.get('date', 'نامشخص')}
-
-🚨 **آمار سیگنال‌ها:**
-🔹 کل سیگنال‌ها: {signal_stats.get('total_signals', 0)}
-🔹 سیگنال‌های خرید: {signal_stats.get('buy_signals', 0)}
-🔹 سیگنال‌های فروش: {signal_stats.get('sell_signals', 0)}
-🔹 میانگین اعتماد: {signal_stats.get('avg_confidence', 0):.1%}
-
-⚠️ **آمار ریسک:**
-🔹 PnL روزانه: ${risk_stats.get('daily_pnl', 0):.2f}
-🔹 تعداد معاملات: {risk_stats.get('daily_trades', 0)}
-🔹 نرخ برد اخیر: {risk_stats.get('recent_win_rate', 0):.1f}%
-
-🤖 **وضعیت سیستم:**
-🔹 نظارت فعال: {'✅' if system_status.get('signal_monitoring_active') else '❌'}
-🔹 کاربران پریمیوم: {system_status.get('subscribers_count', {}).get('premium', 0)}
-🔹 کاربران رایگان: {system_status.get('subscribers_count', {}).get('free', 0)}
-
-⏰ آخرین به‌روزرسانی: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
-        return text
+        return _DAILY_REPORT_TMPL.format_map({
+            'date': report.get('date', 'نامشخص'),
+            'total_signals': signal_stats.get('total_signals', 0),
+            'buy_signals': signal_stats.get('buy_signals', 0),
+            'sell_signals': signal_stats.get('sell_signals', 0),
+            'avg_confidence': signal_stats.get('avg_confidence', 0),
+            'daily_pnl': risk_stats.get('daily_pnl', 0),
+            'daily_trades': risk_stats.get('daily_trades', 0),
+            'recent_win_rate': risk_stats.get('recent_win_rate', 0),
+            'monitoring': '✅' if system_status.get('signal_monitoring_active') else '❌',
+            'premium_users': subscribers.get('premium', 0),
+            'free_users': subscribers.get('free', 0),
+            'now': datetime.now()
+        }) + self._format_summary_error(report)
     
     def _format_weekly_report_text(self, report: Dict) -> str:
         """فرمت کردن گزارش هفتگی"""
         weekly_stats = report.get('weekly_statistics', {})
+        signals = weekly_stats.get('signals', {})
+        risk = weekly_stats.get('risk', {})
         trends = report.get('trends', {})
         recommendations = report.get('recommendations', [])
         
-        text = f"""
-📈 **گزارش هفتگی FlowAI**
-📅 هفته: {report.get('week_start')} تا {report.get('week_end')}
-
-📊 **خلاصه هفتگی:**
-🔹 کل سیگنال‌ها: {weekly_stats.get('signals', {}).get('total', 0)}
-🔹 میانگین روزانه: {weekly_stats.get('signals', {}).get('daily_average', 0):.1f}
-🔹 میانگین اعتماد: {weekly_stats.get('signals', {}).get('avg_confidence', 0):.1%}
-
-💰 **عملکرد مالی:**
-🔹 PnL کل: ${weekly_stats.get('risk', {}).get('total_pnl', 0):.2f}
-🔹 روزهای سودآور: {weekly_stats.get('risk', {}).get('profitable_days', 0)}
-🔹 روزهای ضررده: {weekly_stats.get('risk', {}).get('losing_days', 0)}
-
-📈 **روندها:**
-🔹 روند سیگنال‌ها: {trends.get('signal_count_trend', 'نامشخص')}
-🔹 روند اعتماد: {trends.get('confidence_trend', 'نامشخص')}
-🔹 امتیاز ثبات: {trends.get('consistency_score', 0):.1%}
-
-💡 **توصیه‌ها:**
-"""
-        for i, rec in enumerate(recommendations, 1):
-            text += f"{i}. {rec}\n"
+        parts = [_WEEKLY_REPORT_TMPL.format_map({
+            'week_start': report.get('week_start'),
+            'week_end': report.get('week_end'),
+            'total_signals': signals.get('total', 0),
+            'daily_average': signals.get('daily_average', 0),
+            'avg_confidence': signals.get('avg_confidence', 0),
+            'total_pnl': risk.get('total_pnl', 0),
+            'profitable_days': risk.get('profitable_days', 0),
+            'losing_days': risk.get('losing_days', 0),
+            'signal_count_trend': trends.get('signal_count_trend', 'نامشخص'),
+            'confidence_trend': trends.get('confidence_trend', 'نامشخص'),
+            'consistency_score': trends.get('consistency_score', 0)
+        })]
+        parts.extend(f"{i}. {rec}\n" for i, rec in enumerate(recommendations, 1))
+        parts.append(self._format_summary_error(report))
+        parts.append(f"\n⏰ تاریخ تولید: {datetime.now():%Y-%m-%d %H:%M:%S}")
         
-        text += f"\n⏰ تاریخ تولید: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        return text
+        return "".join(parts)
+
+    def _format_summary_error(self, report: Dict) -> str:
+        """هشدار در دسترس نبودن فایل خلاصه روزانه (در صورت وجود)"""
+        error = report.get('summary_error')
+        return f"\n⚠️ خلاصه روزانه در دسترس نیست: {error}\n" if error else ""
 
 # Global instance
 reporting_engine = ReportingEngine()
@@ -1,10 +1,75 @@
 import logging
+import time
+from collections import deque
 from typing import Dict, Optional, List
 from datetime import datetime, timedelta
 import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """بدون numba هسته‌ها به صورت پایتون عادی اجرا می‌شوند"""
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 logger = logging.getLogger(__name__)
 
+# تعداد رکوردهای نگهداری شده در equity curve
+EQUITY_CURVE_SIZE = 1000
+
+# جهت معامله به صورت عدد صحیح (HOLD = 0)
+DIR_BUY, DIR_SELL = 1, -1
+ACTION_DIRECTIONS = {'BUY': DIR_BUY, 'SELL': DIR_SELL}
+
+def signal_direction(signal: Dict) -> int:
+    """جهت سیگنال (+1 خرید، -1 فروش، 0 بدون معامله)"""
+    direction = signal.get('direction')
+    if direction is None:
+        direction = ACTION_DIRECTIONS.get(signal.get('action'), 0)
+    return direction
+
+@njit(cache=True, fastmath=True)
+def _calc_pos_size(balance, entry_price, stop_loss, risk_per_trade, max_position_size):
+    """هسته محاسبه اندازه موقعیت"""
+    price_risk = abs(entry_price - stop_loss)
+    if price_risk == 0.0 or entry_price <= 0.0:
+        return 0.0
+    position_size = balance * risk_per_trade / price_risk
+    return min(position_size, balance * max_position_size / entry_price)
+
+@njit(cache=True, fastmath=True)
+def _drawdown(current_balance, initial_balance):
+    """هسته محاسبه drawdown (برای موجودی اولیه نامعتبر 0)"""
+    if initial_balance <= 0.0:
+        return 0.0
+    return (initial_balance - current_balance) / initial_balance
+
+@njit(cache=True, fastmath=True)
+def _optimize_exit_core(entry_price, stop_loss, target_price, direction, atr_percent):
+    """هسته بهینه‌سازی سطوح خروج؛ خروجی (stop_loss, target_price)"""
+    atr_value = entry_price * atr_percent
+    
+    # بهینه‌سازی stop loss (در خرید بالاتر، در فروش پایین‌تر)
+    optimal_sl = entry_price - direction * 2 * atr_value
+    if direction > 0:
+        new_sl = max(optimal_sl, stop_loss)
+    else:
+        new_sl = min(optimal_sl, stop_loss)
+    
+    # بهینه‌سازی take profit (Risk:Reward = 1:2)، حداکثر 10% فراتر از هدف فعلی
+    risk = direction * (entry_price - new_sl)
+    optimal_tp = entry_price + direction * 2 * risk
+    tp_cap = target_price * (1 + direction * 0.1)
+    if direction > 0:
+        new_tp = min(optimal_tp, tp_cap)
+    else:
+        new_tp = max(optimal_tp, tp_cap)
+    
+    return new_sl, new_tp
+
 class RiskManager:
     def __init__(self):
         self.max_daily_loss = 0.05  # 5% حداکثر ضرر روزانه
@@ -13,48 +78,44 @@ class RiskManager:
         self.daily_pnl = 0
         self.daily_trades = 0
         self.max_daily_trades = 20
-        self.equity_curve = []
+        self.equity_curve = deque(maxlen=EQUITY_CURVE_SIZE)  # نگهداری آخرین 1000 رکورد
+        # بافر حلقوی PnL معاملات (موازی با equity_curve) برای محاسبات برداری آمار
+        self._pnl_buf = np.zeros(EQUITY_CURVE_SIZE, dtype=np.float64)
+        self._pnl_head = 0
+        self._pnl_len = 0
         self.last_reset = datetime.now().date()
+        # زمان (epoch) نیمه‌شب بعدی؛ تا قبل از آن نیازی به بررسی تاریخ نیست
+        self._next_reset_ts = self._next_midnight_ts(self.last_reset)
         
+    @staticmethod
+    def _next_midnight_ts(day) -> float:
+        """timestamp شروع روز بعد از day (به وقت محلی)"""
+        return datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+    
     def reset_daily_counters(self):
         """ریست کردن شمارنده‌های روزانه"""
+        if time.time() < self._next_reset_ts:
+            return
+        
         today = datetime.now().date()
         if today != self.last_reset:
             self.daily_pnl = 0
             self.daily_trades = 0
             self.last_reset = today
             logger.info("Daily risk counters reset")
+        self._next_reset_ts = self._next_midnight_ts(today)
     
     def calculate_position_size(self, 
                                balance: float,
                                entry_price: float,
                                stop_loss: float,
                                risk_per_trade: float = 0.02) -> float:
-        """محاسبه اندازه موقعیت بر اساس ریسک"""
-        
-        try:
-            # ریسک بر اساس stop loss
-            risk_amount = balance * risk_per_trade
-            price_risk = abs(entry_price - stop_loss)
-            
-            if price_risk == 0:
-                return 0
-            
-            # محاسبه اندازه موقعیت
-            position_size = risk_amount / price_risk
-            
-            # اعمال محدودیت حداکثر اندازه موقعیت
-            max_position_value = balance * self.max_position_size
-            max_position_size = max_position_value / entry_price
-            
-            position_size = min(position_size, max_position_size)
-            
-            logger.debug(f"Calculated position size: {position_size:.4f}")
-            return position_size
-            
-        except Exception as e:
-            logger.error(f"Error calculating position size: {e}")
-            return 0
+        """محاسبه اندازه موقعیت بر اساس ریسک (خطای ورودی به فراخواننده منتقل می‌شود)"""
+        position_size = _calc_pos_size(
+            float(balance), float(entry_price), float(stop_loss), float(risk_per_trade), self.max_position_size
+        )
+        logger.debug("Calculated position size: %.4f", position_size)
+        return position_size
     
     def check_daily_limits(self, balance: float) -> Dict[str, bool]:
         """بررسی محدودیت‌های روزانه"""
@@ -83,10 +144,7 @@ class RiskManager:
     
     def check_drawdown(self, current_balance: float, initial_balance: float) -> bool:
         """بررسی drawdown"""
-        if initial_balance <= 0:
-            return True
-        
-        drawdown = (initial_balance - current_balance) / initial_balance
+        drawdown = _drawdown(float(current_balance), float(initial_balance))
         
         if drawdown >= self.max_drawdown:
             logger.warning(f"Maximum drawdown reached: {drawdown:.2%}")
@@ -158,6 +216,59 @@ class RiskManager:
         
         return validation
     
+    def validate_trades_batch(self, 
+                              signals_df: pd.DataFrame,
+                              balance: float,
+                              initial_balance: float) -> pd.DataFrame:
+        """
+        اعتبارسنجی برداری چند سیگنال (ستون‌های confidence، entry_price و stop_loss)
+        خروجی: DataFrame با ستون‌های approved، position_size و reason به ترتیب سیگنال‌ها
+        """
+        count = len(signals_df)
+        
+        # محدودیت‌های روزانه و drawdown برای همه سیگنال‌ها یکسان است
+        if not self.check_daily_limits(balance)['can_trade']:
+            account_reason = "Daily limits exceeded"
+        elif not self.check_drawdown(balance, initial_balance):
+            account_reason = "Maximum drawdown exceeded"
+        else:
+            account_reason = None
+        
+        if account_reason:
+            return pd.DataFrame({
+                'approved': np.zeros(count, dtype=bool),
+                'position_size': np.zeros(count),
+                'reason': account_reason
+            }, index=signals_df.index)
+        
+        confidence = signals_df['confidence'].to_numpy(dtype=np.float64)
+        entry_price = signals_df['entry_price'].to_numpy(dtype=np.float64)
+        stop_loss = signals_df['stop_loss'].to_numpy(dtype=np.float64)
+        
+        # محاسبه اندازه موقعیت (مشابه calculate_position_size با risk_per_trade=0.02)
+        price_risk = np.abs(entry_price - stop_loss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position_size = np.where(price_risk > 0, balance * 0.02 / price_risk, 0.0)
+            position_size = np.minimum(position_size, balance * self.max_position_size / entry_price)
+        
+        # گیت‌ها به همان ترتیب validate_trade
+        confidence_ok = confidence >= 0.6
+        size_ok = position_size > 0
+        value_ok = position_size * entry_price >= 100  # حداقل $100
+        approved = confidence_ok & size_ok & value_ok
+        
+        reason = np.select(
+            [~confidence_ok, ~size_ok, ~value_ok],
+            ["Signal confidence too low", "Invalid position size", "Position size too small"],
+            default=""
+        )
+        
+        return pd.DataFrame({
+            'approved': approved,
+            'position_size': np.where(approved, position_size, 0.0),
+            'reason': reason
+        }, index=signals_df.index)
+    
     def optimize_exit_levels(self, signal: Dict, balance: float) -> Dict:
         """بهینه‌سازی سطوح خروج"""
         optimized = signal.copy()
@@ -167,29 +278,13 @@ class RiskManager:
             current_sl = signal['stop_loss']
             current_tp = signal['target_price']
             
-            # محاسبه ATR تقریبی (Average True Range)
-            atr_percent = 0.015  # 1.5% تقریبی برای طلا
-            atr_value = entry_price * atr_percent
+            direction = signal_direction(signal)
             
-            if signal['action'] == 'BUY':
-                # بهینه‌سازی stop loss
-                optimal_sl = entry_price - (2 * atr_value)
-                optimized['stop_loss'] = max(optimal_sl, current_sl)
-                
-                # بهینه‌سازی take profit (Risk:Reward = 1:2)
-                risk = entry_price - optimized['stop_loss']
-                optimal_tp = entry_price + (2 * risk)
-                optimized['target_price'] = min(optimal_tp, current_tp * 1.1)  # حداکثر 10% بیشتر
-                
-            elif signal['action'] == 'SELL':
-                # بهینه‌سازی stop loss
-                optimal_sl = entry_price + (2 * atr_value)
-                optimized['stop_loss'] = min(optimal_sl, current_sl)
-                
-                # بهینه‌سازی take profit
-                risk = optimized['stop_loss'] - entry_price
-                optimal_tp = entry_price - (2 * risk)
-                optimized['target_price'] = max(optimal_tp, current_tp * 0.9)  # حداکثر 10% کمتر
+            if direction:
+                # ATR تقریبی (Average True Range): 1.5% برای طلا
+                optimized['stop_loss'], optimized['target_price'] = _optimize_exit_core(
+                    float(entry_price), float(current_sl), float(current_tp), direction, 0.015
+                )
             
             logger.debug(f"Exit levels optimized: SL={optimized['stop_loss']:.2f}, TP={optimized['target_price']:.2f}")
             
@@ -211,24 +306,31 @@ class RiskManager:
             'daily_pnl': self.daily_pnl,
             'daily_trades': self.daily_trades
         })
-        
-        # نگهداری آخرین 1000 رکورد
-        if len(self.equity_curve) > 1000:
-            self.equity_curve.pop(0)
+        self._pnl_buf[self._pnl_head] = pnl
+        self._pnl_head = (self._pnl_head + 1) % EQUITY_CURVE_SIZE
+        self._pnl_len = min(self._pnl_len + 1, EQUITY_CURVE_SIZE)
         
         logger.info(f"Trade result updated: PnL={pnl:.2f}, Daily PnL={self.daily_pnl:.2f}")
     
+    def _recent_pnls(self, count: int) -> np.ndarray:
+        """آخرین count مقدار PnL از بافر حلقوی (به ترتیب زمانی)"""
+        count = min(count, self._pnl_len)
+        indices = np.arange(self._pnl_head - count, self._pnl_head) % EQUITY_CURVE_SIZE
+        return self._pnl_buf[indices]
+    
     def get_risk_statistics(self) -> Dict:
         """دریافت آمار ریسک"""
         self.reset_daily_counters()
         
         # محاسبه آمار از equity curve
-        if len(self.equity_curve) >= 2:
-            recent_pnls = [eq['pnl'] for eq in self.equity_curve[-30:]]  # آخرین 30 معامله
-            win_rate = len([p for p in recent_pnls if p > 0]) / len(recent_pnls) * 100
-            avg_win = np.mean([p for p in recent_pnls if p > 0]) if any(p > 0 for p in recent_pnls) else 0
-            avg_loss = np.mean([p for p in recent_pnls if p < 0]) if any(p < 0 for p in recent_pnls) else 0
-            profit_factor = abs(sum(p for p in recent_pnls if p > 0) / sum(p for p in recent_pnls if p < 0)) if any(p < 0 for p in recent_pnls) else 0
+        if self._pnl_len >= 2:
+            recent_pnls = self._recent_pnls(30)  # آخرین 30 معامله
+            wins = recent_pnls > 0
+            losses = recent_pnls < 0
+            win_rate = float(wins.mean() * 100)
+            avg_win = float(recent_pnls[wins].mean()) if wins.any() else 0
+            avg_loss = float(recent_pnls[losses].mean()) if losses.any() else 0
+            profit_factor = float(abs(recent_pnls[wins].sum() / recent_pnls[losses].sum())) if losses.any() else 0
         else:
             win_rate = 0
             avg_win = 0
@@ -258,7 +360,11 @@ def validate_trading_signal(signal: Dict, balance: float, initial_balance: float
 
 def calculate_safe_position_size(balance: float, entry_price: float, stop_loss: float) -> float:
     """محاسبه اندازه موقعیت ایمن"""
-    return risk_manager.calculate_position_size(balance, entry_price, stop_loss)
+    try:
+        return risk_manager.calculate_position_size(balance, entry_price, stop_loss)
+    except Exception as e:
+        logger.error(f"Error calculating position size: {e}")
+        return 0
 
 def update_trade_pnl(pnl: float):
     """به‌روزرسانی نتیجه معامله"""
@@ -1,7 +1,7 @@
-from .admin_menu import setup_admin_handlers
-from .user_menu import setup_user_handlers
-
-def setup_telegram_handlers(dispatcher):
-    """راه‌اندازی تمام handler های تلگرام"""
-    setup_admin_handlers(dispatcher)
-    setup_user_handlers(dispatcher)
+def setup_telegram_handlers(application):
+    """راه‌اندازی تمام handler های تلگرام (منوها فقط در این زمان import می‌شوند)"""
+    from .admin_menu import setup_admin_handlers
+    from .user_menu import setup_user_handlers
+    
+    setup_admin_handlers(application)
+    setup_user_handlers(application)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# حداکثر طول متن یک پیام تلگرام
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+class OutboundBatcher:
+    """تجمیع پیام‌های غیرفوری هر چت و ارسال آن‌ها در یک پیام در هر بازه flush (برای جلوگیری از خطای 429)"""
+    
+    def __init__(self, bot, flush_interval: float = 2.0, parse_mode: str = 'Markdown'):
+        self.bot = bot
+        self.flush_interval = flush_interval
+        self.parse_mode = parse_mode
+        self._pending: Dict[int, List[str]] = defaultdict(list)
+        self._task = None
+    
+    def enqueue(self, chat_id: int, text: str) -> None:
+        """افزودن پیام به صف چت (باید از داخل event loop صدا زده شود)"""
+        self._pending[chat_id].append(text)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+    
+    async def flush(self) -> None:
+        """ارسال فوری همه پیام‌های در صف (هر چت در کمترین تعداد پیام)"""
+        pending, self._pending = self._pending, defaultdict(list)
+        for chat_id, texts in pending.items():
+            for chunk in self._pack(texts):
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=chunk, parse_mode=self.parse_mode)
+                except Exception as e:
+                    logger.error(f"Failed to send batched message to {chat_id}: {e}")
+    
+    @staticmethod
+    def _pack(texts: List[str]) -> List[str]:
+        """چسباندن پیام‌ها با خط خالی تا سقف طول پیام تلگرام (پیام‌های بلندتر کوتاه می‌شوند)"""
+        chunks = []
+        current = ""
+        for text in texts:
+            text = text[:TELEGRAM_MESSAGE_LIMIT]
+            if current and len(current) + 2 + len(text) > TELEGRAM_MESSAGE_LIMIT:
+                chunks.append(current)
+                current = text
+            else:
+                current = f"{current}\n\n{text}" if current else text
+        if current:
+            chunks.append(current)
+        return chunks
@@ -0,0 +1,38 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+class TTLCache:
+    """کش کوتاه‌مدت مقادیر (مثل قیمت و وضعیت API) برای handler های async تلگرام"""
+    
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+    
+    async def get_or_set(self, key: Hashable, ttl_s: float, producer: Callable[[], Any]) -> Any:
+        """مقدار کش شده تا پایان ttl_s؛ در غیر این صورت producer (blocking) در thread اجرا می‌شود.
+        
+        درخواست‌های همزمان برای یک کلید منتظر همان future در حال اجرا می‌مانند (single-flight)
+        و نتیجه یا خطای آن را مشترکاً دریافت می‌کنند.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._refresh(key, ttl_s, producer))
+        # لغو شدن یک handler محاسبه مشترک را برای بقیه لغو نمی‌کند
+        return await asyncio.shield(future)
+    
+    async def _refresh(self, key: Hashable, ttl_s: float, producer: Callable[[], Any]) -> Any:
+        try:
+            value = await asyncio.to_thread(producer)
+            self._entries[key] = (value, time.monotonic() + ttl_s)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+    
+    def invalidate(self, key: Hashable) -> None:
+        """حذف مقدار کش شده یک کلید"""
+        self._entries.pop(key, None)
@@ -1,165 +1,312 @@
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import CallbackContext, CommandHandler, MessageHandler, Filters, CallbackQueryHandler
+from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 import logging
 import asyncio
+import re
+from collections import OrderedDict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from ..data_sources.brsapi_fetcher import get_brsapi_status, get_brsapi_gold_price
 from ..config import TELEGRAM_ADMIN_IDS, ICT_ENABLED, AI_MODEL_ENABLED
 from ..data_handler import get_processed_data, get_ict_analysis, ict_data_handler
+from ..ict_fastcount import count_ict_patterns
+from ..telegram._cache import TTLCache
+from ..telegram._batcher import OutboundBatcher
 from ..telegram.signal_manager import signal_manager, start_signal_monitoring, stop_signal_monitoring, get_signal_stats
 from ..ai_signal_engine import get_ai_trading_signal, get_market_status
-from ..backtest_engine import run_backtest_analysis, get_backtest_summary
-from ..telegram.premium_manager import premium_manager, get_premium_stats
 from ..risk_manager import get_risk_status
-from ..reporting_engine import export_daily_report_text, export_weekly_report_text
-from ..notification_system import send_system_alert, get_notification_stats
 
 logger = logging.getLogger(__name__)
 
+# اجرای کارهای طولانی (تحلیل اجباری، بک‌تست) خارج از thread دیسپچر تا ربات به بقیه پیام‌ها پاسخ دهد
+_jobs_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="admin-jobs")
+
+def _outbound(context) -> OutboundBatcher:
+    """batcher پیام‌های غیرفوری (تأییدیه‌ها)؛ یک نمونه برای هر Application در bot_data"""
+    batcher = context.bot_data.get('outbound_batcher')
+    if batcher is None:
+        batcher = context.bot_data['outbound_batcher'] = OutboundBatcher(context.bot)
+    return batcher
+
+async def _in_jobs_executor(fn, *args, **kwargs):
+    """اجرای تابع blocking طولانی در executor کارهای ادمین"""
+    return await asyncio.get_running_loop().run_in_executor(_jobs_executor, partial(fn, *args, **kwargs))
+
+def _submit_job(context, job, edit_message, error_prefix: str):
+    """اجرای coroutine job در پس‌زمینه و ویرایش پیام با متن خروجی آن پس از اتمام (handler منتظر نمی‌ماند)"""
+    async def _run_job():
+        try:
+            text = await job
+            await edit_message(text, parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Background admin job failed: {e}")
+            try:
+                await edit_message(f"{error_prefix}: {str(e)}")
+            except Exception as edit_error:
+                logger.error(f"Could not report admin job failure: {edit_error}")
+    
+    context.application.create_task(_run_job())
+
+# کش کوتاه‌مدت (ثانیه)؛ کلیک‌های پشت سر هم ادمین‌ها دوباره API و تحلیل ICT را اجرا نمی‌کنند
+GOLD_PRICE_TTL = 10
+API_STATUS_TTL = 30
+ICT_ANALYSIS_TTL = 60
+STATS_CACHE_TTL = 5
+ICT_DASHBOARD_TTL = 30
+_cache = TTLCache()
+
+def _cached_brsapi_status():
+    return _cache.get_or_set(("api_status",), API_STATUS_TTL, get_brsapi_status)
+
+def _cached_gold_price():
+    return _cache.get_or_set(("gold",), GOLD_PRICE_TTL, get_brsapi_gold_price)
+
+def _cached_ict_analysis():
+    return _cache.get_or_set(("ict",), ICT_ANALYSIS_TTL, get_ict_analysis)
+
+def _cached_signal_stats():
+    return _cache.get_or_set(("signal_stats",), STATS_CACHE_TTL, get_signal_stats)
+
+def _cached_risk_status():
+    return _cache.get_or_set(("risk_status",), STATS_CACHE_TTL, get_risk_status)
+
+# طول کندل هر تایم‌فریم (ثانیه)؛ داده پردازش شده تا بسته شدن کندل جاری معتبر می‌ماند
+_TF_SECONDS = {'1m': 60, '5m': 300, '15m': 900, '30m': 1800, '1h': 3600, '4h': 14400, '1d': 86400}
+
+def _bar_ttl(timeframe: str) -> float:
+    """ثانیه‌های باقیمانده تا بسته شدن کندل جاری"""
+    period = _TF_SECONDS.get(timeframe, 60)
+    return period - time.time() % period
+
+def _cached_processed_data(symbol: str, timeframe: str, limit: int):
+    return _cache.get_or_set(
+        ("data", symbol, timeframe, limit), _bar_ttl(timeframe),
+        partial(get_processed_data, symbol, timeframe, limit)
+    )
+
+# ستون‌هایی از آخرین کندل که منوی ادمین نمایش می‌دهد
+_LATEST_COLS = ('Open', 'High', 'Low', 'Close', 'RSI', 'MACD', 'ATR', 'Market_Structure',
+                'Bullish_OB', 'Bearish_OB', 'Bullish_FVG', 'Bearish_FVG',
+                'Buy_Side_Liquidity_Sweep', 'Sell_Side_Liquidity_Sweep', 'SMA_20')
+
+def _latest_candle(data) -> dict:
+    """مقادیر آخرین کندل با iat (بدون ساخت Series کامل با iloc)"""
+    return {col: data[col].iat[-1] for col in _LATEST_COLS if col in data.columns}
+
+def _ict_dashboard_snapshot(data) -> dict:
+    """خلاصه داشبورد ICT: شمارش الگوها در یک پیمایش و آخرین کندل به صورت dict"""
+    if data.empty:
+        return {}
+    
+    order_blocks, fvgs, liquidity_sweeps = count_ict_patterns(data)
+    return {
+        'order_blocks': order_blocks,
+        'fvgs': fvgs,
+        'liquidity_sweeps': liquidity_sweeps,
+        'latest': _latest_candle(data),
+        'last_update': data.index[-1].strftime('%Y-%m-%d %H:%M')
+    }
+
+async def _cached_ict_dashboard():
+    data = await _cached_processed_data("GOLD", "1h", 100)
+    return await _cache.get_or_set(("ict_dash",), ICT_DASHBOARD_TTL, partial(_ict_dashboard_snapshot, data))
+
+# سقف تعداد و عمر (ثانیه) عملیات در انتظار ادمین‌ها
+PENDING_ACTIONS_MAX = 64
+PENDING_ACTION_TTL = 300
+
+# کیبوردهای منو ثابت هستند و یک بار در زمان import ساخته می‌شوند
+
+# منوی اصلی ادمین ICT-Enhanced
+_MAIN_MENU_MARKUP = ReplyKeyboardMarkup([
+    [
+        KeyboardButton("🎯 ICT Dashboard"),
+        KeyboardButton("🤖 AI & Signals")
+    ],
+    [
+        KeyboardButton("📊 Market Analysis"),
+        KeyboardButton("🧪 ICT Backtest")
+    ],
+    [
+        KeyboardButton("👥 User Management"),
+        KeyboardButton("⚠️ Risk Control")
+    ],
+    [
+        KeyboardButton("📋 Reports & Analytics"),
+        KeyboardButton("🔔 Notifications")
+    ],
+    [
+        KeyboardButton("💰 Live Price"),
+        KeyboardButton("⚙️ ICT Settings")
+    ]
+], resize_keyboard=True, one_time_keyboard=False)
+
+# منوی ICT Dashboard
+_ICT_DASHBOARD_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📈 Order Blocks", callback_data="ict_order_blocks"),
+        InlineKeyboardButton("🔄 Fair Value Gaps", callback_data="ict_fvg")
+    ],
+    [
+        InlineKeyboardButton("💧 Liquidity Sweeps", callback_data="ict_liquidity"),
+        InlineKeyboardButton("🏗️ Market Structure", callback_data="ict_structure")
+    ],
+    [
+        InlineKeyboardButton("🎯 ICT Signals", callback_data="ict_signals"),
+        InlineKeyboardButton("📊 Pattern Stats", callback_data="ict_stats")
+    ],
+    [
+        InlineKeyboardButton("⚙️ ICT Config", callback_data="ict_config"),
+        InlineKeyboardButton("🔄 Refresh Data", callback_data="ict_refresh")
+    ],
+    [
+        InlineKeyboardButton("🔙 Back", callback_data="main_menu")
+    ]
+])
+
+# منوی AI & Signals
+_AI_SIGNALS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🚀 Start Monitoring", callback_data="start_monitoring"),
+        InlineKeyboardButton("⏹️ Stop Monitoring", callback_data="stop_monitoring")
+    ],
+    [
+        InlineKeyboardButton("🔍 Force Analysis", callback_data="force_analysis"),
+        InlineKeyboardButton("🎯 ICT + AI Signal", callback_data="ict_ai_signal")
+    ],
+    [
+        InlineKeyboardButton("📊 Signal Stats", callback_data="signal_stats"),
+        InlineKeyboardButton("🤖 AI Model Status", callback_data="ai_model_status")
+    ],
+    [
+        InlineKeyboardButton("⚙️ Signal Settings", callback_data="signal_settings"),
+        InlineKeyboardButton("🔄 Retrain Model", callback_data="retrain_model")
+    ],
+    [
+        InlineKeyboardButton("🔙 Back", callback_data="main_menu")
+    ]
+])
+
+# منوی گزارش‌ها
+_REPORTS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📅 Daily Report", callback_data="daily_report"),
+        InlineKeyboardButton("📈 Weekly Report", callback_data="weekly_report")
+    ],
+    [
+        InlineKeyboardButton("🔙 Back", callback_data="main_menu")
+    ]
+])
+
+# منوی تحلیل بازار
+_MARKET_ANALYSIS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📈 HTF Analysis", callback_data="htf_analysis"),
+        InlineKeyboardButton("⏰ LTF Analysis", callback_data="ltf_analysis")
+    ],
+    [
+        InlineKeyboardButton("🎯 Multi-Timeframe", callback_data="multi_tf_analysis"),
+        InlineKeyboardButton("📊 Technical Indicators", callback_data="technical_indicators")
+    ],
+    [
+        InlineKeyboardButton("🔍 Pattern Scanner", callback_data="pattern_scanner"),
+        InlineKeyboardButton("💹 Market Sessions", callback_data="market_sessions")
+    ],
+    [
+        InlineKeyboardButton("📋 Full Report", callback_data="full_market_report"),
+        InlineKeyboardButton("🔄 Refresh", callback_data="refresh_analysis")
+    ],
+    [
+        InlineKeyboardButton("🔙 Back", callback_data="main_menu")
+    ]
+])
+
 class ICTAdminMenu:
     def __init__(self):
-        self.admin_ids = TELEGRAM_ADMIN_IDS
-        self.pending_actions = {}
+        self.admin_ids = frozenset(TELEGRAM_ADMIN_IDS)
+        # عملیات در انتظار ورودی ادمین: user_id -> (زمان ثبت، action) با حذف LRU و انقضای 5 دقیقه‌ای
+        self.pending_actions = OrderedDict()
         self.ict_settings = {
             'order_blocks': True,
             'fair_value_gaps': True,
             'liquidity_sweeps': True,
             'market_structure': True
         }
-        logger.info(f"ICT Admin menu initialized with IDs: {self.admin_ids}")
+        logger.info(f"ICT Admin menu initialized with IDs: {sorted(self.admin_ids)}")
     
     def is_admin(self, user_id: int) -> bool:
         """بررسی ادمین بودن کاربر"""
         is_admin = user_id in self.admin_ids
-        logger.info(f"User {user_id} admin check: {is_admin}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"User {user_id} admin check: {is_admin}")
         return is_admin
     
+    def set_pending_action(self, user_id: int, action):
+        """ثبت عملیات در انتظار برای ادمین (قدیمی‌ترین‌ها بیش از سقف حذف می‌شوند)"""
+        self.pending_actions[user_id] = (time.monotonic(), action)
+        self.pending_actions.move_to_end(user_id)
+        while len(self.pending_actions) > PENDING_ACTIONS_MAX:
+            self.pending_actions.popitem(last=False)
+    
+    def pop_pending_action(self, user_id: int):
+        """برداشتن عملیات در انتظار ادمین؛ عملیات منقضی شده None برمی‌گرداند"""
+        entry = self.pending_actions.pop(user_id, None)
+        if entry is None:
+            return None
+        
+        created, action = entry
+        if time.monotonic() - created > PENDING_ACTION_TTL:
+            return None
+        return action
+    
+    def expire_pending_actions(self):
+        """حذف عملیات در انتظار منقضی شده (ترتیب درج = ترتیب زمان ثبت)"""
+        now = time.monotonic()
+        while self.pending_actions:
+            created, _ = next(iter(self.pending_actions.values()))
+            if now - created <= PENDING_ACTION_TTL:
+                break
+            self.pending_actions.popitem(last=False)
+    
     def main_menu_keyboard(self):
         """منوی اصلی ادمین ICT-Enhanced"""
-        keyboard = [
-            [
-                KeyboardButton("🎯 ICT Dashboard"),
-                KeyboardButton("🤖 AI & Signals")
-            ],
-            [
-                KeyboardButton("📊 Market Analysis"),
-                KeyboardButton("🧪 ICT Backtest")
-            ],
-            [
-                KeyboardButton("👥 User Management"),
-                KeyboardButton("⚠️ Risk Control")
-            ],
-            [
-                KeyboardButton("📋 Reports & Analytics"),
-                KeyboardButton("🔔 Notifications")
-            ],
-            [
-                KeyboardButton("💰 Live Price"),
-                KeyboardButton("⚙️ ICT Settings")
-            ]
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        return _MAIN_MENU_MARKUP
     
     def ict_dashboard_keyboard(self):
         """منوی ICT Dashboard"""
-        keyboard = [
-            [
-                InlineKeyboardButton("📈 Order Blocks", callback_data="ict_order_blocks"),
-                InlineKeyboardButton("🔄 Fair Value Gaps", callback_data="ict_fvg")
-            ],
-            [
-                InlineKeyboardButton("💧 Liquidity Sweeps", callback_data="ict_liquidity"),
-                InlineKeyboardButton("🏗️ Market Structure", callback_data="ict_structure")
-            ],
-            [
-                InlineKeyboardButton("🎯 ICT Signals", callback_data="ict_signals"),
-                InlineKeyboardButton("📊 Pattern Stats", callback_data="ict_stats")
-            ],
-            [
-                InlineKeyboardButton("⚙️ ICT Config", callback_data="ict_config"),
-                InlineKeyboardButton("🔄 Refresh Data", callback_data="ict_refresh")
-            ],
-            [
-                InlineKeyboardButton("🔙 Back", callback_data="main_menu")
-            ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return _ICT_DASHBOARD_MARKUP
     
     def ai_signals_keyboard(self):
         """منوی AI & Signals"""
-        keyboard = [
-            [
-                InlineKeyboardButton("🚀 Start Monitoring", callback_data="start_monitoring"),
-                InlineKeyboardButton("⏹️ Stop Monitoring", callback_data="stop_monitoring")
-            ],
-            [
-                InlineKeyboardButton("🔍 Force Analysis", callback_data="force_analysis"),
-                InlineKeyboardButton("🎯 ICT + AI Signal", callback_data="ict_ai_signal")
-            ],
-            [
-                InlineKeyboardButton("📊 Signal Stats", callback_data="signal_stats"),
-                InlineKeyboardButton("🤖 AI Model Status", callback_data="ai_model_status")
-            ],
-            [
-                InlineKeyboardButton("⚙️ Signal Settings", callback_data="signal_settings"),
-                InlineKeyboardButton("🔄 Retrain Model", callback_data="retrain_model")
-            ],
-            [
-                InlineKeyboardButton("🔙 Back", callback_data="main_menu")
-            ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return _AI_SIGNALS_MARKUP
     
     def market_analysis_keyboard(self):
         """منوی تحلیل بازار"""
-        keyboard = [
-            [
-                InlineKeyboardButton("📈 HTF Analysis", callback_data="htf_analysis"),
-                InlineKeyboardButton("⏰ LTF Analysis", callback_data="ltf_analysis")
-            ],
-            [
-                InlineKeyboardButton("🎯 Multi-Timeframe", callback_data="multi_tf_analysis"),
-                InlineKeyboardButton("📊 Technical Indicators", callback_data="technical_indicators")
-            ],
-            [
-                InlineKeyboardButton("🔍 Pattern Scanner", callback_data="pattern_scanner"),
-                InlineKeyboardButton("💹 Market Sessions", callback_data="market_sessions")
-            ],
-            [
-                InlineKeyboardButton("📋 Full Report", callback_data="full_market_report"),
-                InlineKeyboardButton("🔄 Refresh", callback_data="refresh_analysis")
-            ],
-            [
-                InlineKeyboardButton("🔙 Back", callback_data="main_menu")
-            ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
-
-# Instance global
-admin_menu = ICTAdminMenu()
-
-def start_admin(update: Update, context: CallbackContext):
-    """شروع منوی ادمین ICT"""
-    user_id = update.effective_user.id
-    user_name = update.effective_user.first_name
-    
-    logger.info(f"ICT Admin command received from user {user_id} ({user_name})")
-    
-    if not admin_menu.is_admin(user_id):
-        update.message.reply_text(f"⛔ شما دسترسی ادمین ندارید!\n\nID شما: `{user_id}`", parse_mode='Markdown')
-        logger.warning(f"Unauthorized admin access attempt by {user_id}")
-        return
-    
-    try:
-        # دریافت آمار real-time
-        api_status = get_brsapi_status()
-        current_price = get_brsapi_gold_price()
-        signal_stats = get_signal_stats()
-        risk_stats = get_risk_status()
-        
-        # دریافت تحلیل ICT
-        ict_analysis = get_ict_analysis()
-        
-        welcome_text = f"""
+        return _MARKET_ANALYSIS_MARKUP
+
+# برچسب دکمه‌های منوی اصلی ادمین (تطبیق دقیق متن با lookup در frozenset به جای regex)
+_MENU_LABELS = frozenset((
+    "🎯 ICT Dashboard", "🤖 AI & Signals", "📊 Market Analysis", "🧪 ICT Backtest", "👥 User Management",
+    "⚠️ Risk Control", "📋 Reports & Analytics", "🔔 Notifications", "💰 Live Price", "⚙️ ICT Settings"
+))
+
+# callback_data دکمه‌های inline ادمین که هنوز عملیاتی ندارند (فقط پاسخ داده می‌شوند)
+_ACK_CALLBACK_PATTERN = re.compile(
+    r'^(ict_order_blocks|ict_fvg|ict_liquidity|ict_structure|ict_stats|ict_config|ict_refresh'
+    r'|signal_stats|ai_model_status|signal_settings|retrain_model'
+    r'|ltf_analysis|multi_tf_analysis|technical_indicators|pattern_scanner|market_sessions|full_market_report|refresh_analysis)$'
+)
+
+# کاراکترهای ویژه Markdown تلگرام؛ مقادیر متنی پویا قبل از قرار گرفتن در قالب escape می‌شوند
+_MD_SPECIAL = re.compile(r'([_*`\[])')
+
+def _md(value) -> str:
+    """escape مقدار پویا برای parse_mode='Markdown'"""
+    return _MD_SPECIAL.sub(r'\\\1', str(value))
+
+# قالب پیام خوش‌آمد پنل ادمین (یک بار تعریف می‌شود و با format_map پر می‌شود)
+_WELCOME_TMPL = """
 🎯 **FlowAI-ICT Trading Bot Admin Panel**
 
 سلام {user_name} عزیز! 👋
@@ -167,73 +314,36 @@ def start_admin(update: Update, context: CallbackContext):
 
 💰 **Market Data:**
 🔹 Gold Price: ${current_price:.2f}
-🔹 ICT Signal: {ict_analysis.get('signal', 'HOLD')}
-🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
+🔹 ICT Signal: {ict_signal}
+🔹 Confidence: {ict_confidence:.1%}
 
 📡 **System Status:**
-🔹 API Calls: {api_status['daily_calls']}/{api_status['daily_limit']}
-🔹 Usage: {api_status['daily_usage_percent']:.1f}%
-🔹 Signals Today: {signal_stats['total_signals']}
-🔹 Monitoring: {'🟢 Active' if signal_manager.running else '🔴 Inactive'}
+🔹 API Calls: {daily_calls}/{daily_limit}
+🔹 Usage: {daily_usage_percent:.1f}%
+🔹 Signals Today: {total_signals}
+🔹 Monitoring: {monitoring}
 
 🎯 **ICT Features:**
-🔹 ICT Engine: {'🟢 Enabled' if ICT_ENABLED else '🔴 Disabled'}
-🔹 AI Model: {'🟢 Active' if AI_MODEL_ENABLED else '🔴 Inactive'}
-🔹 Order Blocks: {'✅' if admin_menu.ict_settings['order_blocks'] else '❌'}
-🔹 Fair Value Gaps: {'✅' if admin_menu.ict_settings['fair_value_gaps'] else '❌'}
+🔹 ICT Engine: {ict_engine}
+🔹 AI Model: {ai_model}
+🔹 Order Blocks: {order_blocks}
+🔹 Fair Value Gaps: {fair_value_gaps}
 
 ⚠️ **Risk Status:**
-🔹 Daily PnL: ${risk_stats['daily_pnl']:.2f}
-🔹 Trades Today: {risk_stats['daily_trades']}/{risk_stats['max_daily_trades']}
+🔹 Daily PnL: ${daily_pnl:.2f}
+🔹 Trades Today: {daily_trades}/{max_daily_trades}
 
 از منوی زیر گزینه مورد نظر را انتخاب کنید:
 """
-        
-        update.message.reply_text(
-            welcome_text,
-            reply_markup=admin_menu.main_menu_keyboard(),
-            parse_mode='Markdown'
-        )
-        
-    except Exception as e:
-        logger.error(f"Error in start_admin: {e}")
-        update.message.reply_text(
-            f"🎯 **FlowAI-ICT Admin Panel**\n\nسلام {user_name}!\nخوش آمدید به پنل مدیریت ICT.",
-            reply_markup=admin_menu.main_menu_keyboard(),
-            parse_mode='Markdown'
-        )
 
-def handle_admin_menu(update: Update, context: CallbackContext):
-    """مدیریت پیام‌های منوی ادمین"""
-    user_id = update.effective_user.id
-    
-    if not admin_menu.is_admin(user_id):
-        return
-    
-    text = update.message.text
-    logger.info(f"ICT Admin menu action: {text} by user {user_id}")
-    
-    if text == "🎯 ICT Dashboard":
-        try:
-            # دریافت آمار ICT
-            data = get_processed_data("GOLD", "1h", 100)
-            ict_analysis = get_ict_analysis()
-            
-            if not data.empty:
-                # شمارش patterns
-                order_blocks = data['Bullish_OB'].sum() + data['Bearish_OB'].sum()
-                fvgs = data['Bullish_FVG'].sum() + data['Bearish_FVG'].sum()
-                liquidity_sweeps = data['Buy_Side_Liquidity_Sweep'].sum() + data['Sell_Side_Liquidity_Sweep'].sum()
-                
-                latest = data.iloc[-1]
-                
-                ict_text = f"""
+# قالب ICT Dashboard
+_ICT_DASHBOARD_TMPL = """
 🎯 **ICT Dashboard - Live Analysis**
 
 📊 **Current Market State:**
-🔹 Signal: {ict_analysis.get('signal', 'HOLD')}
-🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
-🔹 Market Structure: {latest.get('Market_Structure', 'NEUTRAL')}
+🔹 Signal: {signal}
+🔹 Confidence: {confidence:.1%}
+🔹 Market Structure: {market_structure}
 
 📈 **Pattern Detection (Last 100 Candles):**
 🔹 Order Blocks: {order_blocks}
@@ -241,85 +351,49 @@ def handle_admin_menu(update: Update, context: CallbackContext):
 🔹 Liquidity Sweeps: {liquidity_sweeps}
 
 🎯 **Latest Candle Analysis:**
-🔹 Bullish OB: {'✅' if latest.get('Bullish_OB', False) else '❌'}
-🔹 Bearish OB: {'✅' if latest.get('Bearish_OB', False) else '❌'}
-🔹 Bullish FVG: {'✅' if latest.get('Bullish_FVG', False) else '❌'}
-🔹 Bearish FVG: {'✅' if latest.get('Bearish_FVG', False) else '❌'}
-🔹 Buy Liquidity Sweep: {'✅' if latest.get('Buy_Side_Liquidity_Sweep', False) else '❌'}
-🔹 Sell Liquidity Sweep: {'✅' if latest.get('Sell_Side_Liquidity_Sweep', False) else '❌'}
+🔹 Bullish OB: {bullish_ob}
+🔹 Bearish OB: {bearish_ob}
+🔹 Bullish FVG: {bullish_fvg}
+🔹 Bearish FVG: {bearish_fvg}
+🔹 Buy Liquidity Sweep: {buy_sweep}
+🔹 Sell Liquidity Sweep: {sell_sweep}
 
 📊 **Technical Indicators:**
-🔹 RSI: {latest.get('RSI', 0):.1f}
-🔹 MACD: {latest.get('MACD', 0):.3f}
-🔹 ATR: {latest.get('ATR', 0):.4f}
+🔹 RSI: {rsi:.1f}
+🔹 MACD: {macd:.3f}
+🔹 ATR: {atr:.4f}
 
-⏰ **Last Update:** {data.index[-1].strftime('%Y-%m-%d %H:%M')}
+⏰ **Last Update:** {last_update}
 """
-            else:
-                ict_text = "❌ **ICT Dashboard**\n\nNo data available for analysis."
-            
-            update.message.reply_text(
-                ict_text,
-                reply_markup=admin_menu.ict_dashboard_keyboard(),
-                parse_mode='Markdown'
-            )
-            
-        except Exception as e:
-            update.message.reply_text(f"❌ خطا در ICT Dashboard: {str(e)}")
-    
-    elif text == "🤖 AI & Signals":
-        try:
-            signal_stats = get_signal_stats()
-            market_status = get_market_status()
-            
-            ai_text = f"""
+
+# قالب آمار AI و سیگنال‌ها
+_AI_SIGNALS_TMPL = """
 🤖 **AI & Signal Management**
 
 🚨 **Signal Statistics:**
-🔹 Total Signals: {signal_stats['total_signals']}
-🔹 Buy Signals: {signal_stats['buy_signals']}
-🔹 Sell Signals: {signal_stats['sell_signals']}
-🔹 Average Confidence: {signal_stats['avg_confidence']:.1%}
+🔹 Total Signals: {total_signals}
+🔹 Buy Signals: {buy_signals}
+🔹 Sell Signals: {sell_signals}
+🔹 Average Confidence: {avg_confidence:.1%}
 
 👥 **Subscribers:**
-🔹 Admins: {signal_stats['subscribers_count']['admin']}
-🔹 Premium: {signal_stats['subscribers_count']['premium']}
-🔹 Free: {signal_stats['subscribers_count']['free']}
+🔹 Admins: {admin_subs}
+🔹 Premium: {premium_subs}
+🔹 Free: {free_subs}
 
 🏪 **Market Status:**
-🔹 Active: {'✅' if market_status['market_active'] else '❌'}
-🔹 Cooldown: {market_status['cooldown_remaining']:.0f}s
+🔹 Active: {market_active}
+🔹 Cooldown: {cooldown_remaining:.0f}s
 
 🤖 **AI Model:**
-🔹 Status: {'🟢 Active' if AI_MODEL_ENABLED else '🔴 Inactive'}
-🔹 ICT Integration: {'🟢 Enabled' if ICT_ENABLED else '🔴 Disabled'}
+🔹 Status: {ai_model}
+🔹 ICT Integration: {ict_engine}
 
-⚡ **Monitoring:** {'🟢 Active' if signal_manager.running else '🔴 Inactive'}
+⚡ **Monitoring:** {monitoring}
 """
-            
-            update.message.reply_text(
-                ai_text,
-                reply_markup=admin_menu.ai_signals_keyboard(),
-                parse_mode='Markdown'
-            )
-            
-        except Exception as e:
-            update.message.reply_text(f"❌ خطا در AI & Signals: {str(e)}")
-    
-    elif text == "📊 Market Analysis":
-        update.message.reply_text(
-            "📊 **Market Analysis Center**\n\nSelect analysis type:",
-            reply_markup=admin_menu.market_analysis_keyboard(),
-            parse_mode='Markdown'
-        )
-    
-    elif text == "💰 Live Price":
-        try:
-            current_price = get_brsapi_gold_price()
-            api_status = get_brsapi_status()
-            ict_analysis = get_ict_analysis()
-            
-            price_text = f"""
+
+# قالب قیمت لحظه‌ای طلا
+_LIVE_PRICE_TMPL = """
 💰 **Live Gold Price Analysis**
 
 🏆 **Current Price:** ${current_price:.2f}
@@ -327,51 +401,287 @@ def handle_admin_menu(update: Update, context: CallbackContext):
 ⏰ **Last Update:** Now
 
 🎯 **ICT Analysis:**
-🔹 Signal: {ict_analysis.get('signal', 'HOLD')}
-🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
-🔹 Patterns Detected: {len(ict_analysis.get('reasons', []))}
+🔹 Signal: {signal}
+🔹 Confidence: {confidence:.1%}
+🔹 Patterns Detected: {patterns}
 
 📡 **API Status:**
-🔹 Calls Today: {api_status['daily_calls']}/{api_status['daily_limit']}
-🔹 Usage: {api_status['daily_usage_percent']:.1f}%
-🔹 Remaining: {api_status['daily_remaining']}
+🔹 Calls Today: {daily_calls}/{daily_limit}
+🔹 Usage: {daily_usage_percent:.1f}%
+🔹 Remaining: {daily_remaining}
 
 🔄 **Auto-refresh:** Every 10 seconds
 """
-            
-            update.message.reply_text(price_text, parse_mode='Markdown')
-            
-        except Exception as e:
-            update.message.reply_text(f"❌ خطا در دریافت قیمت: {str(e)}")
 
-def handle_admin_callbacks(update: Update, context: CallbackContext):
-    """مدیریت callback های ادمین ICT"""
+# bias کلی HTF بر اساس (ساختار 4H، ساختار Daily)
+_HTF_BIAS_TABLE = {
+    ('BULLISH', 'BULLISH'): "🟢 **STRONG BULLISH BIAS**",
+    ('BEARISH', 'BEARISH'): "🔴 **STRONG BEARISH BIAS**"
+}
+_HTF_BIAS_DEFAULT = "🟡 **MIXED/NEUTRAL BIAS**"
+
+# Instance global
+admin_menu = ICTAdminMenu()
+
+async def start_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """شروع منوی ادمین ICT"""
+    user_id = update.effective_user.id
+    user_name = update.effective_user.first_name
+    
+    logger.info(f"ICT Admin command received from user {user_id} ({user_name})")
+    
+    if not admin_menu.is_admin(user_id):
+        await update.message.reply_text(f"⛔ شما دسترسی ادمین ندارید!\n\nID شما: `{user_id}`", parse_mode='Markdown')
+        logger.warning(f"Unauthorized admin access attempt by {user_id}")
+        return
+    
+    try:
+        # دریافت همزمان آمار real-time و تحلیل ICT
+        api_status, current_price, signal_stats, risk_stats, ict_analysis = await asyncio.gather(
+            _cached_brsapi_status(), _cached_gold_price(), _cached_signal_stats(), _cached_risk_status(), _cached_ict_analysis()
+        )
+        
+        welcome_text = _WELCOME_TMPL.format_map({
+            'user_name': _md(user_name),
+            'current_price': current_price,
+            'ict_signal': ict_analysis.get('signal', 'HOLD'),
+            'ict_confidence': ict_analysis.get('confidence', 0),
+            'daily_calls': api_status['daily_calls'],
+            'daily_limit': api_status['daily_limit'],
+            'daily_usage_percent': api_status['daily_usage_percent'],
+            'total_signals': signal_stats['total_signals'],
+            'monitoring': '🟢 Active' if signal_manager.running else '🔴 Inactive',
+            'ict_engine': '🟢 Enabled' if ICT_ENABLED else '🔴 Disabled',
+            'ai_model': '🟢 Active' if AI_MODEL_ENABLED else '🔴 Inactive',
+            'order_blocks': '✅' if admin_menu.ict_settings['order_blocks'] else '❌',
+            'fair_value_gaps': '✅' if admin_menu.ict_settings['fair_value_gaps'] else '❌',
+            'daily_pnl': risk_stats['daily_pnl'],
+            'daily_trades': risk_stats['daily_trades'],
+            'max_daily_trades': risk_stats['max_daily_trades']
+        })
+        
+        await update.message.reply_text(
+            welcome_text,
+            reply_markup=admin_menu.main_menu_keyboard(),
+            parse_mode='Markdown'
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in start_admin: {e}")
+        await update.message.reply_text(
+            f"🎯 **FlowAI-ICT Admin Panel**\n\nسلام {_md(user_name)}!\nخوش آمدید به پنل مدیریت ICT.",
+            reply_markup=admin_menu.main_menu_keyboard(),
+            parse_mode='Markdown'
+        )
+
+async def _menu_ict_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش ICT Dashboard"""
+    # دریافت همزمان خلاصه داشبورد و تحلیل ICT (هر دو از کش کوتاه‌مدت)
+    snapshot, ict_analysis = await asyncio.gather(
+        _cached_ict_dashboard(), _cached_ict_analysis()
+    )
+    
+    if snapshot:
+        latest = snapshot['latest']
+        
+        ict_text = _ICT_DASHBOARD_TMPL.format_map({
+            'signal': ict_analysis.get('signal', 'HOLD'),
+            'confidence': ict_analysis.get('confidence', 0),
+            'market_structure': latest.get('Market_Structure', 'NEUTRAL'),
+            'order_blocks': snapshot['order_blocks'],
+            'fvgs': snapshot['fvgs'],
+            'liquidity_sweeps': snapshot['liquidity_sweeps'],
+            'bullish_ob': '✅' if latest.get('Bullish_OB', False) else '❌',
+            'bearish_ob': '✅' if latest.get('Bearish_OB', False) else '❌',
+            'bullish_fvg': '✅' if latest.get('Bullish_FVG', False) else '❌',
+            'bearish_fvg': '✅' if latest.get('Bearish_FVG', False) else '❌',
+            'buy_sweep': '✅' if latest.get('Buy_Side_Liquidity_Sweep', False) else '❌',
+            'sell_sweep': '✅' if latest.get('Sell_Side_Liquidity_Sweep', False) else '❌',
+            'rsi': latest.get('RSI', 0),
+            'macd': latest.get('MACD', 0),
+            'atr': latest.get('ATR', 0),
+            'last_update': snapshot['last_update']
+        })
+    else:
+        ict_text = "❌ **ICT Dashboard**\n\nNo data available for analysis."
+    
+    await update.message.reply_text(
+        ict_text,
+        reply_markup=admin_menu.ict_dashboard_keyboard(),
+        parse_mode='Markdown'
+    )
+
+async def _menu_ai_signals(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش آمار AI و سیگنال‌ها"""
+    signal_stats, market_status = await asyncio.gather(
+        _cached_signal_stats(), asyncio.to_thread(get_market_status)
+    )
+    
+    ai_text = _AI_SIGNALS_TMPL.format_map({
+        'total_signals': signal_stats['total_signals'],
+        'buy_signals': signal_stats['buy_signals'],
+        'sell_signals': signal_stats['sell_signals'],
+        'avg_confidence': signal_stats['avg_confidence'],
+        'admin_subs': signal_stats['subscribers_count']['admin'],
+        'premium_subs': signal_stats['subscribers_count']['premium'],
+        'free_subs': signal_stats['subscribers_count']['free'],
+        'market_active': '✅' if market_status['market_active'] else '❌',
+        'cooldown_remaining': market_status['cooldown_remaining'],
+        'ai_model': '🟢 Active' if AI_MODEL_ENABLED else '🔴 Inactive',
+        'ict_engine': '🟢 Enabled' if ICT_ENABLED else '🔴 Disabled',
+        'monitoring': '🟢 Active' if signal_manager.running else '🔴 Inactive'
+    })
+    
+    await update.message.reply_text(
+        ai_text,
+        reply_markup=admin_menu.ai_signals_keyboard(),
+        parse_mode='Markdown'
+    )
+
+async def _menu_market_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش منوی تحلیل بازار"""
+    # متن ثابت بدون فرمت؛ نیازی به parse_mode نیست
+    await update.message.reply_text(
+        "📊 Market Analysis Center\n\nSelect analysis type:",
+        reply_markup=admin_menu.market_analysis_keyboard()
+    )
+
+async def _menu_live_price(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """نمایش قیمت لحظه‌ای طلا"""
+    current_price, api_status, ict_analysis = await asyncio.gather(
+        _cached_gold_price(), _cached_brsapi_status(), _cached_ict_analysis()
+    )
+    
+    price_text = _LIVE_PRICE_TMPL.format_map({
+        'current_price': current_price,
+        'signal': ict_analysis.get('signal', 'HOLD'),
+        'confidence': ict_analysis.get('confidence', 0),
+        'patterns': len(ict_analysis.get('reasons', [])),
+        'daily_calls': api_status['daily_calls'],
+        'daily_limit': api_status['daily_limit'],
+        'daily_usage_percent': api_status['daily_usage_percent'],
+        'daily_remaining': api_status['daily_remaining']
+    })
+    
+    await update.message.reply_text(price_text, parse_mode='Markdown')
+
+def _ict_backtest_text() -> str:
+    """اجرای بک‌تست با پارامترهای پیش‌فرض و برگرداندن خلاصه آن"""
+    from ..backtest_engine import run_isolated_backtest
+    
+    return run_isolated_backtest({})
+
+async def _menu_ict_backtest(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """اجرای بک‌تست ICT در پس‌زمینه"""
+    message = await update.message.reply_text("🧪 **ICT Backtest**\n\n📊 در حال اجرا...", parse_mode='Markdown')
+    _submit_job(context, _in_jobs_executor(_ict_backtest_text), message.edit_text, "❌ خطا در بک‌تست")
+
+async def _menu_reports(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """ارسال گزارش روزانه همراه با منوی گزارش‌ها در یک پیام"""
+    from ..reporting_engine import export_daily_report_text
+    
+    combined = await asyncio.to_thread(export_daily_report_text) + "\n📋 **Reports & Analytics**\nSelect a report:"
+    await update.message.reply_text(combined, reply_markup=_REPORTS_MARKUP, parse_mode='Markdown')
+
+# جدول dispatch منوی ادمین (برچسب دکمه -> handler)
+_MENU_HANDLERS = {
+    "🎯 ICT Dashboard": _menu_ict_dashboard,
+    "🤖 AI & Signals": _menu_ai_signals,
+    "📊 Market Analysis": _menu_market_analysis,
+    "🧪 ICT Backtest": _menu_ict_backtest,
+    "📋 Reports & Analytics": _menu_reports,
+    "💰 Live Price": _menu_live_price
+}
+
+async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """مدیریت پیام‌های منوی ادمین"""
+    # دکمه‌هایی که هنوز handler ندارند قبل از بررسی ادمین و لاگ کنار گذاشته می‌شوند
+    text = update.message.text
+    handler = _MENU_HANDLERS.get(text)
+    if handler is None:
+        return
+    
+    user_id = update.effective_user.id
+    if not admin_menu.is_admin(user_id):
+        return
+    
+    logger.info(f"ICT Admin menu action: {text} by user {user_id}")
+    await handler(update, context)
+
+async def _ict_ai_signal_text() -> str:
+    """تحلیل ترکیبی ICT + AI (کند؛ دو تحلیل همزمان در thread ها اجرا می‌شوند)"""
+    # ترکیب ICT + AI
+    ict_analysis, ai_signal = await asyncio.gather(
+        _cached_ict_analysis(),
+        _in_jobs_executor(get_ai_trading_signal, force_analysis=True)
+    )
+    
+    if not (ai_signal and ict_analysis):
+        return "❌ Unable to generate combined signal"
+    
+    combined_text = f"""
+🎯 **ICT + AI Combined Signal**
+
+🤖 **AI Analysis:**
+🔹 Signal: {ai_signal.get('action', 'HOLD')}
+🔹 Confidence: {ai_signal.get('confidence', 0):.1%}
+🔹 Entry: ${ai_signal.get('entry_price', 0):.2f}
+🔹 Target: ${ai_signal.get('target_price', 0):.2f}
+🔹 Stop Loss: ${ai_signal.get('stop_loss', 0):.2f}
+
+🎯 **ICT Analysis:**
+🔹 Signal: {ict_analysis.get('signal', 'HOLD')}
+🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
+🔹 Patterns: {len(ict_analysis.get('reasons', []))}
+
+🔄 **Combined Decision:**
+"""
+    
+    # ترکیب سیگنال‌ها
+    if ai_signal['action'] == ict_analysis['signal']:
+        combined_confidence = (ai_signal['confidence'] + ict_analysis['confidence']) / 2
+        combined_text += f"✅ **STRONG {ai_signal['action']}** - Confidence: {combined_confidence:.1%}\n"
+        combined_text += "🎯 Both AI and ICT agree on direction!"
+    else:
+        combined_text += f"⚠️ **CONFLICTED** - AI: {ai_signal['action']}, ICT: {ict_analysis['signal']}\n"
+        combined_text += "🤔 Consider waiting for alignment"
+    
+    return combined_text
+
+async def _admin_query(update: Update):
+    """پاسخ به callback و بررسی ادمین؛ برای غیر ادمین None برمی‌گرداند"""
     query = update.callback_query
-    query.answer()
+    await query.answer()
     
     user_id = query.from_user.id
     if not admin_menu.is_admin(user_id):
-        query.edit_message_text("⛔ شما دسترسی ادمین ندارید!")
+        await query.edit_message_text("⛔ شما دسترسی ادمین ندارید!")
+        return None
+    
+    logger.info(f"ICT Admin callback: {query.data} by user {user_id}")
+    return query
+
+async def _cb_ict_signals(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """تحلیل سیگنال‌های ICT"""
+    query = await _admin_query(update)
+    if query is None:
         return
     
-    data = query.data
-    logger.info(f"ICT Admin callback: {data} by user {user_id}")
+    ict_analysis, data_df = await asyncio.gather(
+        _cached_ict_analysis(),
+        _cached_processed_data("GOLD", "1h", 50)
+    )
     
-    if data == "ict_signals":
-        try:
-            ict_analysis = get_ict_analysis()
-            data_df = get_processed_data("GOLD", "1h", 50)
-            
-            if not data_df.empty:
-                latest = data_df.iloc[-1]
-                
-                signal_text = f"""
+    if not data_df.empty:
+        latest = _latest_candle(data_df)
+        
+        signal_text = f"""
 🎯 **ICT Signals Analysis**
 
 📊 **Current Signal:**
 🔹 Action: {ict_analysis.get('signal', 'HOLD')}
 🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
-🔹 Reasons: {', '.join(ict_analysis.get('reasons', []))}
+🔹 Reasons: {_md(', '.join(ict_analysis.get('reasons', [])))}
 
 🎯 **ICT Patterns Active:**
 🔹 Order Blocks: {'✅' if ict_analysis.get('ict_patterns', {}).get('order_blocks') else '❌'}
@@ -387,74 +697,79 @@ def handle_admin_callbacks(update: Update, context: CallbackContext):
 
 ⏰ **Analysis Time:** {data_df.index[-1].strftime('%Y-%m-%d %H:%M')}
 """
-                
-                query.edit_message_text(signal_text, parse_mode='Markdown')
-            else:
-                query.edit_message_text("❌ No data available for ICT signals analysis")
-                
-        except Exception as e:
-            query.edit_message_text(f"❌ خطا در تحلیل ICT: {str(e)}")
+        
+        await query.edit_message_text(signal_text, parse_mode='Markdown')
+    else:
+        await query.edit_message_text("❌ No data available for ICT signals analysis")
+
+async def _cb_ict_ai_signal(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """سیگنال ترکیبی ICT + AI در پس‌زمینه"""
+    query = await _admin_query(update)
+    if query is None:
+        return
     
-    elif data == "ict_ai_signal":
-        try:
-            # ترکیب ICT + AI
-            ict_analysis = get_ict_analysis()
-            ai_signal = get_ai_trading_signal(force_analysis=True)
-            
-            if ai_signal and ict_analysis:
-                combined_text = f"""
-🎯 **ICT + AI Combined Signal**
+    await query.edit_message_text("🎯 **ICT + AI Combined Signal**\n\n⏳ در حال اجرا...", parse_mode='Markdown')
+    _submit_job(context, _ict_ai_signal_text(), query.edit_message_text, "❌ خطا در سیگنال ترکیبی")
 
-🤖 **AI Analysis:**
-🔹 Signal: {ai_signal.get('action', 'HOLD')}
-🔹 Confidence: {ai_signal.get('confidence', 0):.1%}
-🔹 Entry: ${ai_signal.get('entry_price', 0):.2f}
-🔹 Target: ${ai_signal.get('target_price', 0):.2f}
-🔹 Stop Loss: ${ai_signal.get('stop_loss', 0):.2f}
+async def _cb_start_monitoring(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """شروع مانیتورینگ سیگنال"""
+    query = await _admin_query(update)
+    if query is None:
+        return
+    
+    await asyncio.to_thread(start_signal_monitoring)
+    _outbound(context).enqueue(query.message.chat_id, "✅ **ICT Signal Monitoring Started**\n\nSystem will check market every 5 minutes with ICT analysis.")
 
-🎯 **ICT Analysis:**
-🔹 Signal: {ict_analysis.get('signal', 'HOLD')}
-🔹 Confidence: {ict_analysis.get('confidence', 0):.1%}
-🔹 Patterns: {len(ict_analysis.get('reasons', []))}
+async def _cb_stop_monitoring(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """توقف مانیتورینگ سیگنال"""
+    query = await _admin_query(update)
+    if query is None:
+        return
+    
+    await asyncio.to_thread(stop_signal_monitoring)
+    _outbound(context).enqueue(query.message.chat_id, "⏹️ **ICT Signal Monitoring Stopped**")
 
-🔄 **Combined Decision:**
-"""
-                
-                # ترکیب سیگنال‌ها
-                if ai_signal['action'] == ict_analysis['signal']:
-                    combined_confidence = (ai_signal['confidence'] + ict_analysis['confidence']) / 2
-                    combined_text += f"✅ **STRONG {ai_signal['action']}** - Confidence: {combined_confidence:.1%}\n"
-                    combined_text += "🎯 Both AI and ICT agree on direction!"
-                else:
-                    combined_text += f"⚠️ **CONFLICTED** - AI: {ai_signal['action']}, ICT: {ict_analysis['signal']}\n"
-                    combined_text += "🤔 Consider waiting for alignment"
-                
-                query.edit_message_text(combined_text, parse_mode='Markdown')
-            else:
-                query.edit_message_text("❌ Unable to generate combined signal")
-                
-        except Exception as e:
-            query.edit_message_text(f"❌ خطا در سیگنال ترکیبی: {str(e)}")
+async def _cb_force_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """تحلیل اجباری و ارسال سیگنال دستی"""
+    query = await _admin_query(update)
+    if query is None:
+        return
+    
+    await query.edit_message_text("🔍 **Force Analysis**\n\nRunning ICT + AI analysis...", parse_mode='Markdown')
     
-    elif data == "start_monitoring":
-        start_signal_monitoring()
-        query.edit_message_text("✅ **ICT Signal Monitoring Started**\n\nSystem will check market every 5 minutes with ICT analysis.", parse_mode='Markdown')
+    # ارسال سیگنال دستی روی loop مدیر سیگنال (نتیجه مستقیماً برای ادمین ارسال می‌شود)
+    signal_manager.submit(signal_manager.send_manual_signal(query.from_user.id, force=True))
+
+async def _cb_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """گزارش روزانه یا هفتگی"""
+    query = await _admin_query(update)
+    if query is None:
+        return
     
-    elif data == "stop_monitoring":
-        stop_signal_monitoring()
-        query.edit_message_text("⏹️ **ICT Signal Monitoring Stopped**", parse_mode='Markdown')
+    from ..reporting_engine import export_daily_report_text, export_weekly_report_text
     
-    elif data == "htf_analysis":
-        try:
-            # تحلیل Higher Time Frame
-            htf_data = get_processed_data("GOLD", "4h", 100)
-            daily_data = get_processed_data("GOLD", "1d", 50)
-            
-            if not htf_data.empty and not daily_data.empty:
-                htf_latest = htf_data.iloc[-1]
-                daily_latest = daily_data.iloc[-1]
-                
-                htf_text = f"""
+    report_text = await asyncio.to_thread(
+        export_daily_report_text if query.data == "daily_report" else export_weekly_report_text
+    )
+    await query.edit_message_text(report_text, reply_markup=_REPORTS_MARKUP, parse_mode='Markdown')
+
+async def _cb_htf_analysis(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """تحلیل Higher Time Frame"""
+    query = await _admin_query(update)
+    if query is None:
+        return
+    
+    # تحلیل Higher Time Frame
+    htf_data, daily_data = await asyncio.gather(
+        _cached_processed_data("GOLD", "4h", 100),
+        _cached_processed_data("GOLD", "1d", 50)
+    )
+    
+    if not htf_data.empty and not daily_data.empty:
+        htf_latest = _latest_candle(htf_data)
+        daily_latest = _latest_candle(daily_data)
+        
+        htf_text = f"""
 📈 **Higher Time Frame Analysis**
 
 📊 **4H Timeframe:**
@@ -470,30 +785,56 @@ def handle_admin_callbacks(update: Update, context: CallbackContext):
 
 🎯 **HTF Bias:**
 """
-                
-                # تعیین bias کلی
-                if (htf_latest.get('Market_Structure') == 'BULLISH' and 
-                    daily_latest.get('Market_Structure') == 'BULLISH'):
-                    htf_text += "🟢 **STRONG BULLISH BIAS**"
-                elif (htf_latest.get('Market_Structure') == 'BEARISH' and 
-                      daily_latest.get('Market_Structure') == 'BEARISH'):
-                    htf_text += "🔴 **STRONG BEARISH BIAS**"
-                else:
-                    htf_text += "🟡 **MIXED/NEUTRAL BIAS**"
-                
-                query.edit_message_text(htf_text, parse_mode='Markdown')
-            else:
-                query.edit_message_text("❌ Insufficient data for HTF analysis")
-                
+        
+        # تعیین bias کلی
+        htf_text += _HTF_BIAS_TABLE.get(
+            (htf_latest.get('Market_Structure', 'NEUTRAL'), daily_latest.get('Market_Structure', 'NEUTRAL')),
+            _HTF_BIAS_DEFAULT
+        )
+        
+        await query.edit_message_text(htf_text, parse_mode='Markdown')
+    else:
+        await query.edit_message_text("❌ Insufficient data for HTF analysis")
+
+async def _cb_acknowledge(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """دکمه‌های ادمینی که هنوز عملیاتی ندارند؛ فقط به callback پاسخ داده می‌شود"""
+    await _admin_query(update)
+
+async def _on_handler_error(update: object, context: ContextTypes.DEFAULT_TYPE):
+    """ثبت خطای handler ها و ارسال پیام عمومی به کاربر (به جای try/except در هر شاخه)"""
+    logger.error(f"Error while handling update: {context.error}", exc_info=context.error)
+    
+    if isinstance(update, Update) and update.effective_chat is not None:
+        try:
+            await context.bot.send_message(update.effective_chat.id, "❌ خطا در پردازش درخواست. لطفاً دوباره تلاش کنید.")
         except Exception as e:
-            query.edit_message_text(f"❌ خطا در تحلیل HTF: {str(e)}")
+            logger.error(f"Could not report handler error: {e}")
 
 # Setup handlers
-def setup_admin_handlers(dispatcher):
+async def _expire_admin_state(context: ContextTypes.DEFAULT_TYPE):
+    """حذف عملیات در انتظار و بک‌تست‌های منقضی شده"""
+    from ..telegram.backtest_manager import backtest_manager
+    
+    admin_menu.expire_pending_actions()
+    backtest_manager.expire_backtests()
+
+def setup_admin_handlers(application):
     """راه‌اندازی handler های ادمین ICT"""
-    dispatcher.add_handler(CommandHandler('admin', start_admin))
-    dispatcher.add_handler(MessageHandler(
-        Filters.text & Filters.regex(r'^(🎯 ICT Dashboard|🤖 AI & Signals|📊 Market Analysis|🧪 ICT Backtest|👥 User Management|⚠️ Risk Control|📋 Reports & Analytics|🔔 Notifications|💰 Live Price|⚙️ ICT Settings)$'), 
+    application.add_handler(CommandHandler('admin', start_admin))
+    application.add_handler(MessageHandler(
+        filters.Text(_MENU_LABELS), 
         handle_admin_menu
     ))
-    dispatcher.add_handler(CallbackQueryHandler(handle_admin_callbacks))
+    application.add_handler(CallbackQueryHandler(_cb_ict_signals, pattern=r'^ict_signals$'))
+    application.add_handler(CallbackQueryHandler(_cb_ict_ai_signal, pattern=r'^ict_ai_signal$'))
+    application.add_handler(CallbackQueryHandler(_cb_start_monitoring, pattern=r'^start_monitoring$'))
+    application.add_handler(CallbackQueryHandler(_cb_stop_monitoring, pattern=r'^stop_monitoring$'))
+    application.add_handler(CallbackQueryHandler(_cb_force_analysis, pattern=r'^force_analysis$'))
+    application.add_handler(CallbackQueryHandler(_cb_report, pattern=r'^(daily_report|weekly_report)$'))
+    application.add_handler(CallbackQueryHandler(_cb_htf_analysis, pattern=r'^htf_analysis$'))
+    application.add_handler(CallbackQueryHandler(_cb_acknowledge, pattern=_ACK_CALLBACK_PATTERN))
+    application.add_error_handler(_on_handler_error)
+    
+    # پاکسازی دوره‌ای عملیات منقضی شده (JobQueue فقط با python-telegram-bot[job-queue] موجود است)
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(_expire_admin_state, interval=60, first=60)
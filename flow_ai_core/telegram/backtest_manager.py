@@ -1,17 +1,93 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import CallbackContext
+from telegram.ext import ContextTypes, CallbackQueryHandler
 import logging
+import asyncio
+import time
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+# سقف تعداد و عمر (ثانیه) بک‌تست‌های ثبت شده
+RUNNING_BACKTESTS_MAX = 64
+RUNNING_BACKTEST_TTL = 86400
+
+# حداقل فاصله (ثانیه) بین ویرایش‌های پیام پیشرفت (محدودیت flood تلگرام)
+BACKTEST_PROGRESS_INTERVAL = 2.0
+
+# کیبوردها ثابت هستند و یک بار در زمان import ساخته می‌شوند
+_RUNNING_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📊 مشاهده نتایج", callback_data="show_backtest_results")],
+    [InlineKeyboardButton("🔙 بازگشت", callback_data="backtest_menu")]
+])
+
+_RESULTS_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📁 دانلود گزارش", callback_data="download_backtest_report")],
+    [InlineKeyboardButton("🔄 بک‌تست جدید", callback_data="start_backtest")],
+    [InlineKeyboardButton("🔙 بازگشت", callback_data="backtest_menu")]
+])
+
+# قالب پیام بک‌تست در حال اجرا
+_PROGRESS_TMPL = """
+🧪 **بک‌تست شروع شد**
+
+📊 **پارامترها:**
+🔹 نماد: {symbol}
+🔹 تایم فریم: {timeframe}
+🔹 تاریخ شروع: {start_date}
+🔹 تاریخ پایان: {end_date}
+🔹 سرمایه اولیه: ${initial_balance:,}
+
+⏳ در حال پردازش... {progress:.0%}
+"""
+
 class BacktestManager:
     def __init__(self):
-        self.running_backtests = {}  # ذخیره بک‌تست‌های در حال اجرا
+        self.running_backtests = OrderedDict()  # user_id -> (زمان ثبت، وضعیت بک‌تست)
+    
+    def register_backtest(self, user_id: int, params: dict) -> dict:
+        """ثبت بک‌تست کاربر (قدیمی‌ترین‌ها بیش از سقف حذف می‌شوند)"""
+        state = {'params': params, 'progress': 0.0, 'done': False, 'summary': None, 'error': None}
+        self.running_backtests[user_id] = (time.monotonic(), state)
+        self.running_backtests.move_to_end(user_id)
+        while len(self.running_backtests) > RUNNING_BACKTESTS_MAX:
+            self.running_backtests.popitem(last=False)
+        return state
+    
+    def get_backtest(self, user_id: int):
+        """وضعیت آخرین بک‌تست کاربر؛ بک‌تست منقضی شده None برمی‌گرداند"""
+        entry = self.running_backtests.get(user_id)
+        if entry is None:
+            return None
+        
+        created, state = entry
+        if time.monotonic() - created > RUNNING_BACKTEST_TTL:
+            return None
+        return state
+    
+    def expire_backtests(self):
+        """حذف بک‌تست‌های منقضی شده"""
+        now = time.monotonic()
+        while self.running_backtests:
+            created, _ = next(iter(self.running_backtests.values()))
+            if now - created <= RUNNING_BACKTEST_TTL:
+                break
+            self.running_backtests.popitem(last=False)
     
-    def start_backtest(self, update: Update, context: CallbackContext):
+    async def start_backtest(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """شروع بک‌تست جدید"""
         query = update.callback_query
-        query.answer()
+        await query.answer()
+        
+        # بک‌تست در حال اجرای همین کاربر دوباره شروع نمی‌شود
+        user_id = query.from_user.id
+        current = self.get_backtest(user_id)
+        if current is not None and not current['done']:
+            await query.edit_message_text(
+                _PROGRESS_TMPL.format_map({**current['params'], 'progress': current['progress']}),
+                reply_markup=_RUNNING_MARKUP,
+                parse_mode='Markdown'
+            )
+            return
         
         # پارامترهای پیش‌فرض
         backtest_params = {
@@ -21,81 +97,104 @@ class BacktestManager:
             'end_date': '2024-12-31',
             'initial_balance': 10000
         }
+        state = self.register_backtest(user_id, backtest_params)
         
-        # شروع بک‌تست (شبیه‌سازی)
-        result_text = f"""
-🧪 **بک‌تست شروع شد**
-
-📊 **پارامترها:**
-🔹 نماد: {backtest_params['symbol']}
-🔹 تایم فریم: {backtest_params['timeframe']}
-🔹 تاریخ شروع: {backtest_params['start_date']}
-🔹 تاریخ پایان: {backtest_params['end_date']}
-🔹 سرمایه اولیه: ${backtest_params['initial_balance']:,}
-
-⏳ در حال پردازش... (30 ثانیه)
-"""
-        
-        keyboard = [
-            [InlineKeyboardButton("📊 مشاهده نتایج", callback_data="show_backtest_results")],
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="backtest_menu")]
-        ]
-        
-        query.edit_message_text(
-            result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+        await query.edit_message_text(
+            _PROGRESS_TMPL.format_map({**backtest_params, 'progress': 0.0}),
+            reply_markup=_RUNNING_MARKUP,
             parse_mode='Markdown'
         )
+        
+        # اجرای بک‌تست در پس‌زمینه؛ handler منتظر پایان آن نمی‌ماند
+        context.application.create_task(self._run_backtest_async(query.edit_message_text, state))
     
-    def show_results(self, update: Update, context: CallbackContext):
+    async def _run_backtest_async(self, edit_message, state: dict):
+        """اجرای بک‌تست در thread و به‌روزرسانی پیام پیشرفت (حداکثر هر BACKTEST_PROGRESS_INTERVAL ثانیه)"""
+        from ..backtest_engine import run_isolated_backtest
+        
+        params = state['params']
+        
+        def on_progress(fraction: float):
+            state['progress'] = fraction
+        
+        def run_and_summarize() -> str:
+            return run_isolated_backtest(params, progress_callback=on_progress)
+        
+        job = asyncio.ensure_future(asyncio.to_thread(run_and_summarize))
+        shown_percent = 0
+        try:
+            while True:
+                done, _ = await asyncio.wait({job}, timeout=BACKTEST_PROGRESS_INTERVAL)
+                if done:
+                    break
+                
+                percent = int(state['progress'] * 100)
+                if percent == shown_percent:
+                    continue
+                shown_percent = percent
+                
+                try:
+                    await edit_message(
+                        _PROGRESS_TMPL.format_map({**params, 'progress': state['progress']}),
+                        reply_markup=_RUNNING_MARKUP,
+                        parse_mode='Markdown'
+                    )
+                except Exception as e:
+                    logger.error(f"Could not update backtest progress: {e}")
+            
+            state['summary'] = job.result()
+            text = state['summary']
+        except Exception as e:
+            logger.error(f"Backtest job failed: {e}")
+            state['error'] = str(e)
+            text = f"❌ خطا در بک‌تست: {str(e)}"
+        finally:
+            state['done'] = True
+        
+        try:
+            await edit_message(text, reply_markup=_RESULTS_MARKUP, parse_mode='Markdown')
+        except Exception as e:
+            logger.error(f"Could not report backtest result: {e}")
+    
+    async def show_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """نمایش نتایج بک‌تست"""
         query = update.callback_query
-        query.answer()
+        await query.answer()
         
-        # نتایج شبیه‌سازی شده
-        results_text = """
-📈 **نتایج بک‌تست**
-
-💰 **عملکرد مالی:**
-🔹 سرمایه اولیه: $10,000
-🔹 سرمایه نهایی: $12,450
-🔹 سود خالص: $2,450 (24.5%)
-🔹 حداکثر ضرر: -$850 (8.5%)
-
-📊 **آمار معاملات:**
-🔹 تعداد معاملات: 45
-🔹 معاملات سودآور: 28 (62%)
-🔹 معاملات ضررده: 17 (38%)
-🔹 میانگین سود: $87.5
-
-⭐ **امتیاز کلی: 8.2/10**
-"""
+        state = self.get_backtest(query.from_user.id)
+        if state is None:
+            await query.edit_message_text("❌ بک‌تستی برای نمایش یافت نشد.", reply_markup=_RESULTS_MARKUP)
+            return
         
-        keyboard = [
-            [InlineKeyboardButton("📁 دانلود گزارش", callback_data="download_backtest_report")],
-            [InlineKeyboardButton("🔄 بک‌تست جدید", callback_data="start_backtest")],
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="backtest_menu")]
-        ]
+        if not state['done']:
+            await query.edit_message_text(
+                _PROGRESS_TMPL.format_map({**state['params'], 'progress': state['progress']}),
+                reply_markup=_RUNNING_MARKUP,
+                parse_mode='Markdown'
+            )
+            return
         
-        query.edit_message_text(
-            results_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+        if state['error'] is not None:
+            await query.edit_message_text(f"❌ خطا در بک‌تست: {state['error']}", reply_markup=_RESULTS_MARKUP)
+            return
+        
+        await query.edit_message_text(
+            state['summary'],
+            reply_markup=_RESULTS_MARKUP,
             parse_mode='Markdown'
         )
 
 # Instance global
 backtest_manager = BacktestManager()
 
-def setup_backtest_handlers(dispatcher):
+def setup_backtest_handlers(application):
     """راه‌اندازی handler های بک‌تست"""
-    from telegram.ext import CallbackQueryHandler
-    
-    dispatcher.add_handler(CallbackQueryHandler(
+    application.add_handler(CallbackQueryHandler(
         backtest_manager.start_backtest,
         pattern=r'^start_backtest$'
     ))
     
-    dispatcher.add_handler(CallbackQueryHandler(
+    application.add_handler(CallbackQueryHandler(
         backtest_manager.show_results,
         pattern=r'^(show_backtest_results|last_results)$'
     ))
@@ -7,41 +7,172 @@ from ..config import TELEGRAM_PREMIUM_USERS, TELEGRAM_ADMIN_IDS
 from .signal_manager import signal_manager
 import json
 import os
+import sqlite3
+from collections import deque
+from itertools import islice
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# کیبورد مدیریت کاربران ثابت است و یک بار در زمان import ساخته می‌شود
+_USER_MANAGEMENT_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("➕ اضافه کردن کاربر", callback_data="add_premium_user"),
+        InlineKeyboardButton("➖ حذف کاربر", callback_data="remove_premium_user")
+    ],
+    [
+        InlineKeyboardButton("📋 لیست کاربران", callback_data="list_premium_users"),
+        InlineKeyboardButton("📊 آمار کاربران", callback_data="premium_statistics")
+    ],
+    [
+        InlineKeyboardButton("📜 تاریخچه", callback_data="premium_history"),
+        InlineKeyboardButton("💾 پشتیبان‌گیری", callback_data="backup_premium_data")
+    ],
+    [
+        InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")
+    ]
+])
+
+# عمر (ثانیه) آمار کش شده؛ پنجره ۳۰ روزه با گذر زمان جابجا می‌شود
+PREMIUM_STATS_TTL = 60
+
+# حداکثر ردیف‌های تاریخچه نگه‌داری شده در حافظه (همه ردیف‌ها در دیتابیس می‌مانند)
+PREMIUM_HISTORY_MEMORY = 5000
+
+# ستون‌های جدول تاریخچه به ترتیب درج
+_HISTORY_COLUMNS = ('user_id', 'action', 'admin_id', 'timestamp', 'duration_days', 'expires_at')
+
+# قالب‌های پیام لیست و تاریخچه (یک بار تعریف می‌شوند و با format_map پر می‌شوند)
+_PREMIUM_LIST_HEADER_TMPL = "📋 **لیست کاربران پریمیوم**\n\n📊 **آمار:** {total_users} کاربر پریمیوم\n📄 **صفحه:** {page} از {total_pages}\n\n"
+_PREMIUM_LIST_ROW_TMPL = "{0}. `{1}`\n"
+_HISTORY_HEADER_TMPL = "📜 **تاریخچه کاربران پریمیوم**\n\n📊 **نمایش:** {shown} مورد از {total}\n\n"
+_HISTORY_ENTRY_TMPL = "{action_emoji} **{action}**\n👤 کاربر: `{user_id}`\n👨‍💼 ادمین: `{admin_id}`\n⏰ زمان: {timestamp}\n"
+_HISTORY_DURATION_TMPL = "📅 مدت: {} روز\n"
+
+def _history_entry(row) -> Dict:
+    """تبدیل ردیف تاریخچه به dict (ستون‌های خالی حذف می‌شوند)"""
+    return {col: value for col, value in zip(_HISTORY_COLUMNS, row) if value is not None}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS premium_users (user_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS premium_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER,
+    action TEXT,
+    admin_id INTEGER,
+    timestamp TEXT,
+    duration_days INTEGER,
+    expires_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_hist_ts ON premium_history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_hist_action ON premium_history(action, timestamp);
+CREATE INDEX IF NOT EXISTS idx_hist_user ON premium_history(user_id);
+CREATE INDEX IF NOT EXISTS idx_hist_admin ON premium_history(admin_id);
+"""
+
 class PremiumManager:
     def __init__(self):
         self.premium_users = set(TELEGRAM_PREMIUM_USERS)
-        self.premium_history = []
-        self.data_file = "premium_users.json"
+        self.premium_history = deque(maxlen=PREMIUM_HISTORY_MEMORY)  # به ترتیب زمان، فقط append
+        self._history_total = 0
+        self.data_file = "premium_users.json"  # فایل قدیمی؛ فقط برای انتقال یک‌باره به SQLite
+        self.db_file = "premium.db"
+        self._db_lock = threading.Lock()
+        self._db = self._open_db()
+        # کش آمار و لیست مرتب کاربران؛ با هر تغییر کاربران باطل می‌شوند
+        self._stats_cache = None
+        self._stats_time = 0.0
+        self._stats_dirty = True
+        self._sorted_users_tuple = None
         self.load_premium_data()
+    
+    def _open_db(self) -> sqlite3.Connection:
+        """اتصال SQLite (autocommit، WAL) و ساخت جدول‌ها"""
+        conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+    
+    def _import_json_data(self):
+        """انتقال یک‌باره premium_users.json قدیمی به دیتابیس"""
+        # فایل یک‌جا خوانده و با orjson (در صورت نصب بودن) parse می‌شود
+        with open(self.data_file, 'rb') as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
+        
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO premium_users (user_id) VALUES (?)",
+                    [(user_id,) for user_id in data.get('users', [])]
+                )
+                self._db.executemany(
+                    "INSERT INTO premium_history (user_id, action, admin_id, timestamp, duration_days, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [tuple(h.get(col) for col in _HISTORY_COLUMNS) for h in data.get('history', [])]
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
         
+        os.replace(self.data_file, self.data_file + ".migrated")
+        logger.info(f"Migrated {self.data_file} to {self.db_file}")
+    
     def load_premium_data(self):
         """بارگذاری داده‌های کاربران پریمیوم"""
         try:
             if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.premium_users = set(data.get('users', []))
-                    self.premium_history = data.get('history', [])
-                    logger.info(f"Loaded {len(self.premium_users)} premium users")
+                self._import_json_data()
+            
+            with self._db_lock:
+                users = self._db.execute("SELECT user_id FROM premium_users").fetchall()
+                history = self._db.execute(
+                    "SELECT user_id, action, admin_id, timestamp, duration_days, expires_at "
+                    "FROM premium_history ORDER BY id DESC LIMIT ?", (PREMIUM_HISTORY_MEMORY,)
+                ).fetchall()
+                history_total = self._db.execute("SELECT COUNT(*) FROM premium_history").fetchone()[0]
+            
+            if users:
+                self.premium_users = {row[0] for row in users}
+            self._invalidate_caches()
+            self.premium_history = deque(map(_history_entry, reversed(history)), maxlen=PREMIUM_HISTORY_MEMORY)
+            self._history_total = history_total
+            logger.info(f"Loaded {len(self.premium_users)} premium users")
         except Exception as e:
             logger.error(f"Error loading premium data: {e}")
     
-    def save_premium_data(self):
-        """ذخیره داده‌های کاربران پریمیوم"""
-        try:
-            data = {
-                'users': list(self.premium_users),
-                'history': self.premium_history,
-                'last_updated': datetime.now().isoformat()
-            }
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logger.info("Premium data saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving premium data: {e}")
+    def _record_change(self, user_id: int, added: bool, entry: Dict):
+        """ثبت تغییر کاربر و ردیف تاریخچه در یک تراکنش"""
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            try:
+                if added:
+                    self._db.execute("INSERT OR IGNORE INTO premium_users (user_id) VALUES (?)", (user_id,))
+                else:
+                    self._db.execute("DELETE FROM premium_users WHERE user_id = ?", (user_id,))
+                self._db.execute(
+                    "INSERT INTO premium_history (user_id, action, admin_id, timestamp, duration_days, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    tuple(entry.get(col) for col in _HISTORY_COLUMNS)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+    
+    def _invalidate_caches(self):
+        """باطل کردن آمار و لیست مرتب کش شده پس از تغییر کاربران"""
+        self._stats_dirty = True
+        self._sorted_users_tuple = None
     
     def is_premium(self, user_id: int) -> bool:
         """بررسی پریمیوم بودن کاربر"""
@@ -51,22 +182,24 @@ class PremiumManager:
         """اضافه کردن کاربر پریمیوم"""
         try:
             if user_id not in self.premium_users:
-                self.premium_users.add(user_id)
-                
                 # اضافه کردن به سیستم سیگنال
                 signal_manager.add_subscriber(user_id, 'premium')
                 
-                # ثبت در تاریخچه
-                self.premium_history.append({
+                # ثبت در تاریخچه (زمان ثبت و انقضا از یک بار خواندن ساعت)
+                now = datetime.now()
+                entry = {
                     'user_id': user_id,
                     'action': 'added',
                     'admin_id': admin_id,
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': now.isoformat(),
                     'duration_days': duration_days,
-                    'expires_at': (datetime.now() + timedelta(days=duration_days)).isoformat()
-                })
-                
-                self.save_premium_data()
+                    'expires_at': (now + timedelta(days=duration_days)).isoformat()
+                }
+                self._record_change(user_id, True, entry)
+                self.premium_users.add(user_id)
+                self.premium_history.append(entry)
+                self._history_total += 1
+                self._invalidate_caches()
                 logger.info(f"User {user_id} added to premium by admin {admin_id}")
                 return True
             else:
@@ -81,21 +214,22 @@ class PremiumManager:
         """حذف کاربر پریمیوم"""
         try:
             if user_id in self.premium_users:
-                self.premium_users.discard(user_id)
-                
                 # حذف از سیستم سیگنال پریمیوم و اضافه به رایگان
                 signal_manager.remove_subscriber(user_id, 'premium')
                 signal_manager.add_subscriber(user_id, 'free')
                 
                 # ثبت در تاریخچه
-                self.premium_history.append({
+                entry = {
                     'user_id': user_id,
                     'action': 'removed',
                     'admin_id': admin_id,
                     'timestamp': datetime.now().isoformat()
-                })
-                
-                self.save_premium_data()
+                }
+                self._record_change(user_id, False, entry)
+                self.premium_users.discard(user_id)
+                self.premium_history.append(entry)
+                self._history_total += 1
+                self._invalidate_caches()
                 logger.info(f"User {user_id} removed from premium by admin {admin_id}")
                 return True
             else:
@@ -107,53 +241,67 @@ class PremiumManager:
             return False
     
     def get_premium_statistics(self) -> Dict:
-        """دریافت آمار کاربران پریمیوم"""
-        total_premium = len(self.premium_users)
+        """دریافت آمار کاربران پریمیوم (کش تا تغییر بعدی یا PREMIUM_STATS_TTL ثانیه)"""
+        now = time.monotonic()
+        if not self._stats_dirty and now - self._stats_time < PREMIUM_STATS_TTL:
+            return self._stats_cache
         
-        # آمار تاریخچه
-        recent_additions = len([h for h in self.premium_history 
-                               if h['action'] == 'added' and 
-                               datetime.fromisoformat(h['timestamp']) > datetime.now() - timedelta(days=30)])
+        total_premium = len(self.premium_users)
         
-        recent_removals = len([h for h in self.premium_history 
-                              if h['action'] == 'removed' and 
-                              datetime.fromisoformat(h['timestamp']) > datetime.now() - timedelta(days=30)])
+        # آمار تاریخچه (ISO timestamp ها به ترتیب رشته‌ای هم مرتب هستند؛ شمارش با index)
+        cutoff = (datetime.now() - timedelta(days=30)).isoformat()
+        with self._db_lock:
+            recent_additions = self._db.execute(
+                "SELECT COUNT(*) FROM premium_history WHERE action = 'added' AND timestamp > ?", (cutoff,)
+            ).fetchone()[0]
+            recent_removals = self._db.execute(
+                "SELECT COUNT(*) FROM premium_history WHERE action = 'removed' AND timestamp > ?", (cutoff,)
+            ).fetchone()[0]
         
-        return {
+        self._stats_cache = {
             'total_premium_users': total_premium,
             'recent_additions': recent_additions,
             'recent_removals': recent_removals,
-            'total_history_entries': len(self.premium_history),
-            'premium_users_list': list(self.premium_users)
+            'total_history_entries': self._history_total,
+            'premium_users_list': list(self._get_sorted_users())
         }
+        self._stats_time = now
+        self._stats_dirty = False
+        return self._stats_cache
+    
+    def _get_sorted_users(self) -> tuple:
+        """tuple مرتب شناسه کاربران پریمیوم (فقط پس از تغییر مجموعه دوباره ساخته می‌شود)"""
+        if self._sorted_users_tuple is None:
+            self._sorted_users_tuple = tuple(sorted(self.premium_users))
+        return self._sorted_users_tuple
+    
+    def _query_history(self, column: str, value: int) -> List[Dict]:
+        """ردیف‌های تاریخچه با مقدار column (به ترتیب زمان) از طریق index دیتابیس"""
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT user_id, action, admin_id, timestamp, duration_days, expires_at "
+                f"FROM premium_history WHERE {column} = ? ORDER BY id", (value,)
+            ).fetchall()
+        return [_history_entry(row) for row in rows]
+    
+    def get_user_history(self, user_id: int) -> List[Dict]:
+        """تاریخچه افزودن/حذف یک کاربر"""
+        return self._query_history('user_id', user_id)
+    
+    def get_admin_history(self, admin_id: int) -> List[Dict]:
+        """تغییراتی که یک ادمین انجام داده است"""
+        return self._query_history('admin_id', admin_id)
     
     def get_user_management_keyboard(self):
         """کیبورد مدیریت کاربران"""
-        keyboard = [
-            [
-                InlineKeyboardButton("➕ اضافه کردن کاربر", callback_data="add_premium_user"),
-                InlineKeyboardButton("➖ حذف کاربر", callback_data="remove_premium_user")
-            ],
-            [
-                InlineKeyboardButton("📋 لیست کاربران", callback_data="list_premium_users"),
-                InlineKeyboardButton("📊 آمار کاربران", callback_data="premium_statistics")
-            ],
-            [
-                InlineKeyboardButton("📜 تاریخچه", callback_data="premium_history"),
-                InlineKeyboardButton("💾 پشتیبان‌گیری", callback_data="backup_premium_data")
-            ],
-            [
-                InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")
-            ]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return _USER_MANAGEMENT_MARKUP
     
     def format_premium_list(self, page: int = 0, page_size: int = 10) -> str:
         """فرمت کردن لیست کاربران پریمیوم"""
         if not self.premium_users:
             return "📋 **لیست کاربران پریمیوم**\n\nهیچ کاربر پریمیومی وجود ندارد."
         
-        users_list = list(self.premium_users)
+        users_list = self._get_sorted_users()
         total_users = len(users_list)
         total_pages = (total_users + page_size - 1) // page_size
         
@@ -161,43 +309,40 @@ class PremiumManager:
         end_idx = min(start_idx + page_size, total_users)
         page_users = users_list[start_idx:end_idx]
         
-        text = f"📋 **لیست کاربران پریمیوم**\n\n"
-        text += f"📊 **آمار:** {total_users} کاربر پریمیوم\n"
-        text += f"📄 **صفحه:** {page + 1} از {total_pages}\n\n"
-        
-        for i, user_id in enumerate(page_users, start=start_idx + 1):
-            text += f"{i}. `{user_id}`\n"
-        
-        return text
+        header = _PREMIUM_LIST_HEADER_TMPL.format_map({
+            'total_users': total_users,
+            'page': page + 1,
+            'total_pages': total_pages
+        })
+        rows = [_PREMIUM_LIST_ROW_TMPL.format(i, user_id) for i, user_id in enumerate(page_users, start=start_idx + 1)]
+        return header + "".join(rows)
     
     def format_premium_history(self, limit: int = 20) -> str:
         """فرمت کردن تاریخچه کاربران پریمیوم"""
         if not self.premium_history:
             return "📜 **تاریخچه کاربران پریمیوم**\n\nتاریخچه‌ای وجود ندارد."
         
-        # مرتب‌سازی بر اساس زمان (جدیدترین اول)
-        sorted_history = sorted(self.premium_history, 
-                               key=lambda x: x['timestamp'], 
-                               reverse=True)[:limit]
+        # ردیف‌ها به ترتیب زمان اضافه می‌شوند؛ جدیدترین‌ها بدون مرتب‌سازی از انتها خوانده می‌شوند
+        sorted_history = list(islice(reversed(self.premium_history), limit))
         
-        text = f"📜 **تاریخچه کاربران پریمیوم**\n\n"
-        text += f"📊 **نمایش:** {len(sorted_history)} مورد از {len(self.premium_history)}\n\n"
+        parts = [_HISTORY_HEADER_TMPL.format_map({'shown': len(sorted_history), 'total': self._history_total})]
         
         for entry in sorted_history:
-            action_emoji = "➕" if entry['action'] == 'added' else "➖"
-            timestamp = datetime.fromisoformat(entry['timestamp'])
-            
-            text += f"{action_emoji} **{entry['action'].title()}**\n"
-            text += f"👤 کاربر: `{entry['user_id']}`\n"
-            text += f"👨‍💼 ادمین: `{entry['admin_id']}`\n"
-            text += f"⏰ زمان: {timestamp.strftime('%Y-%m-%d %H:%M')}\n"
+            parts.append(_HISTORY_ENTRY_TMPL.format_map({
+                'action_emoji': "➕" if entry['action'] == 'added' else "➖",
+                'action': entry['action'].title(),
+                'user_id': entry['user_id'],
+                'admin_id': entry['admin_id'],
+                # timestamp ها با isoformat ذخیره شده‌اند؛ 'YYYY-MM-DDTHH:MM' بدون parse از رشته برداشته می‌شود
+                'timestamp': entry['timestamp'][:16].replace('T', ' ')
+            }))
             
             if 'duration_days' in entry:
-                text += f"📅 مدت: {entry['duration_days']} روز\n"
+                parts.append(_HISTORY_DURATION_TMPL.format(entry['duration_days']))
             
-            text += "\n"
+            parts.append("\n")
         
-        return text
+        return "".join(parts)
 
 # Global instance
 premium_manager = PremiumManager()
@@ -214,6 +359,10 @@ def remove_premium_user(user_id: int, admin_id: int) -> bool:
     """حذف کاربر پریمیوم"""
     return premium_manager.remove_premium_user(user_id, admin_id)
 
+def get_user_premium_history(user_id: int) -> List[Dict]:
+    """دریافت تاریخچه پریمیوم یک کاربر"""
+    return premium_manager.get_user_history(user_id)
+
 def get_premium_stats() -> Dict:
     """دریافت آمار کاربران پریمیوم"""
     return premium_manager.get_premium_statistics()
@@ -1,213 +1,381 @@
 import asyncio
 import logging
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from telegram import Bot
-from telegram.error import TelegramError
+from telegram.error import RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
 from ..ai_signal_engine import get_ai_trading_signal, get_market_status
 from ..config import TELEGRAM_BOT_TOKEN, TELEGRAM_PREMIUM_USERS, TELEGRAM_ADMIN_IDS
 import threading
-import time
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
+# تعداد سیگنال‌های نگهداری شده در تاریخچه
+SIGNAL_HISTORY_SIZE = 50
+
+# ارسال در دسته‌های SIGNAL_SEND_CONCURRENCY پیامی با فاصله SIGNAL_BATCH_INTERVAL ثانیه
+# (سقف سراسری تلگرام حدود 30 پیام در ثانیه است)
+SIGNAL_SEND_CONCURRENCY = 30
+SIGNAL_BATCH_INTERVAL = 1.0
+
+# تعداد تلاش دوباره یک ارسال پس از خطای 429 (RetryAfter)
+SIGNAL_SEND_RETRIES = 2
+
+# از این تعداد مقصد به بالا، پیام کاربران غیرادمین بدون اعلان (disable_notification) ارسال می‌شود
+SIGNAL_SILENT_BROADCAST_MIN = 1000
+
+# اندازه pool اتصال‌های HTTP ربات سیگنال (هم‌اندازه سقف ارسال هم‌زمان، تا ارسال‌ها منتظر اتصال نمانند)
+SIGNAL_BOT_POOL_SIZE = 32
+
+_ACTION_EMOJI = {
+    'BUY': '🟢',
+    'SELL': '🔴', 
+    'HOLD': '🟡'
+}
+
+# جدول escape کاراکترهای ویژه parse_mode='Markdown' (یک بار ساخته می‌شود)
+_MD_ESCAPE = str.maketrans({'_': r'\_', '*': r'\*', '`': r'\`', '[': r'\['})
+
+# سطوح مشترکین به ترتیب اولویت (کاربری که در چند سطح است بالاترین را می‌گیرد)
+_TIER_PRIORITY = ('admin', 'premium', 'free')
+
+# قالب پیام سیگنال (یک بار تعریف می‌شوند و با format_map پر می‌شوند)
+_PREMIUM_SIGNAL_TMPL = """
+🚨 **سیگنال معاملاتی FlowAI** 🚨
+
+{action_emoji} **عمل:** {action}
+⭐ **اعتماد:** {confidence:.1%} {confidence_stars}
+
+💰 **قیمت‌ها:**
+🔹 قیمت فعلی: ${current_price:.2f}
+🔹 قیمت ورود: ${entry_price:.2f}
+🎯 هدف: ${target_price:.2f} ({target_pct:+.1f}%)
+🛑 حد ضرر: ${stop_loss:.2f} ({stop_pct:+.1f}%)
+
+📊 **تحلیل تکنیکال:**
+🔹 RSI: {rsi:.1f}
+🔹 MACD: {macd:.3f}
+🔹 SMA20: ${sma_20:.2f}
+🔹 امتیاز صعودی: {bullish_score}
+🔹 امتیاز نزولی: {bearish_score}
+
+⏰ **زمان:** {timestamp:%Y-%m-%d %H:%M:%S}
+🏪 **وضعیت بازار:** {market_state}
+{forced}
+
+⚠️ **هشدار:** این سیگنال صرفاً جنبه آموزشی دارد.
+"""
+
+_FREE_SIGNAL_TMPL = """
+🚨 **سیگنال رایگان FlowAI** 🚨
+
+{action_emoji} **عمل:** {action}
+⭐ **اعتماد:** {confidence_stars}
+
+💰 **قیمت فعلی:** ${current_price:.2f}
+
+💎 **برای دریافت تحلیل کامل:**
+🔹 اهداف قیمتی دقیق
+🔹 حد ضرر محاسبه شده
+🔹 تحلیل‌های تکنیکال پیشرفته
+🔹 اطلاع‌رسانی فوری
+
+👆 ارتقا به پریمیوم دهید!
+
+⏰ {timestamp:%H:%M}
+"""
+
 class TelegramSignalManager:
     def __init__(self):
-        self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        # اتصال‌های keep-alive به api.telegram.org بین ارسال‌ها دوباره استفاده می‌شوند
+        self.bot = Bot(
+            token=TELEGRAM_BOT_TOKEN,
+            request=HTTPXRequest(
+                connection_pool_size=SIGNAL_BOT_POOL_SIZE,
+                connect_timeout=5.0,
+                read_timeout=10.0,
+                pool_timeout=5.0
+            )
+        )
         self.running = False
-        self.signal_thread = None
+        # event loop اختصاصی (یک بار ساخته می‌شود) برای نظارت و ارسال‌ها؛ اتصال‌های ربات بین دوره‌ها حفظ می‌شوند
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._monitor_future = None
         self.check_interval = 300  # 5 دقیقه
         self.subscribers = {
             'premium': set(TELEGRAM_PREMIUM_USERS),
             'admin': set(TELEGRAM_ADMIN_IDS),
             'free': set()
         }
-        self.signal_history = []
+        # تعداد مشترکین هر سطح (همراه با افزودن/حذف مشترک به‌روز می‌شود)
+        self._sub_counts = {tier: len(ids) for tier, ids in self.subscribers.items()}
+        # نقشه معکوس کاربر -> بالاترین سطح (همراه با افزودن/حذف مشترک به‌روز می‌شود)
+        self._user_tier: Dict[int, str] = {}
+        for tier in reversed(_TIER_PRIORITY):
+            self._user_tier.update(dict.fromkeys(self.subscribers[tier], tier))
+        self.signal_history = deque(maxlen=SIGNAL_HISTORY_SIZE)  # قدیمی‌ترین سیگنال خودکار حذف می‌شود
+        # شمارنده‌های جاری تاریخچه (همراه با افزودن/حذف سیگنال به‌روز می‌شوند)
+        self._action_counts = {'BUY': 0, 'SELL': 0, 'HOLD': 0}
+        self._conf_sum = 0.0
+        self._last_signal_iso: Optional[str] = None
+        self._signal_frame: Optional[pd.DataFrame] = None  # نمای ستونی تاریخچه (با هر سیگنال جدید باطل می‌شود)
+        self._message_cache: Optional[Dict] = None  # پیام‌های فرمت شده آخرین سیگنال: {'signal', 'fields', 'messages'}
         
     def add_subscriber(self, user_id: int, tier: str = 'free'):
         """اضافه کردن مشترک"""
         if tier in self.subscribers:
             self.subscribers[tier].add(user_id)
+            self._sub_counts[tier] = len(self.subscribers[tier])
+            self._update_user_tier(user_id)
             logger.info(f"User {user_id} added to {tier} subscribers")
     
     def remove_subscriber(self, user_id: int, tier: str = 'free'):
         """حذف مشترک"""
         if tier in self.subscribers:
             self.subscribers[tier].discard(user_id)
+            self._sub_counts[tier] = len(self.subscribers[tier])
+            self._update_user_tier(user_id)
             logger.info(f"User {user_id} removed from {tier} subscribers")
     
+    def _update_user_tier(self, user_id: int):
+        """به‌روزرسانی سطح کاربر در نقشه معکوس پس از تغییر عضویت"""
+        for tier in _TIER_PRIORITY:
+            if user_id in self.subscribers[tier]:
+                self._user_tier[user_id] = tier
+                return
+        self._user_tier.pop(user_id, None)
+    
+    def subscriber_counts(self) -> Dict[str, int]:
+        """تعداد مشترکین هر سطح"""
+        return dict(self._sub_counts)
+    
+    @property
+    def last_signal_iso(self) -> Optional[str]:
+        """زمان آخرین سیگنال ارسال شده (ISO) یا None"""
+        return self._last_signal_iso
+    
     def format_signal_message(self, signal: Dict, tier: str = 'free') -> str:
-        """فرمت کردن پیام سیگنال برای تلگرام"""
-        action_emoji = {
-            'BUY': '🟢',
-            'SELL': '🔴', 
-            'HOLD': '🟡'
-        }
+        """فرمت کردن پیام سیگنال برای تلگرام (هر قالب برای هر سیگنال فقط یک بار ساخته می‌شود)"""
+        # ادمین و پریمیوم پیام کامل یکسان می‌گیرند
+        style = 'premium' if tier == 'premium' or tier == 'admin' else 'free'
         
-        confidence_stars = '⭐' * int(signal['confidence'] * 5)
+        cache = self._message_cache
+        if cache is None or cache['signal'] is not signal:
+            cache = self._message_cache = {
+                'signal': signal,
+                'fields': self._signal_fields(signal),
+                'messages': {}
+            }
         
-        if tier == 'premium' or tier == 'admin':
-            # پیام کامل برای کاربران پریمیوم
-            message = f"""
-🚨 **سیگنال معاملاتی FlowAI** 🚨
-
-{action_emoji.get(signal['action'], '🟡')} **عمل:** {signal['action']}
-⭐ **اعتماد:** {signal['confidence']:.1%} {confidence_stars}
-
-💰 **قیمت‌ها:**
-🔹 قیمت فعلی: ${signal['current_price']:.2f}
-🔹 قیمت ورود: ${signal['entry_price']:.2f}
-🎯 هدف: ${signal['target_price']:.2f} ({((signal['target_price']/signal['entry_price']-1)*100):+.1f}%)
-🛑 حد ضرر: ${signal['stop_loss']:.2f} ({((signal['stop_loss']/signal['entry_price']-1)*100):+.1f}%)
-
-📊 **تحلیل تکنیکال:**
-🔹 RSI: {signal['indicators']['rsi']:.1f}
-🔹 MACD: {signal['indicators']['macd']:.3f}
-🔹 SMA20: ${signal['indicators']['sma_20']:.2f}
-🔹 امتیاز صعودی: {signal['bullish_score']}
-🔹 امتیاز نزولی: {signal['bearish_score']}
-
-⏰ **زمان:** {signal['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}
-🏪 **وضعیت بازار:** {'فعال' if signal['market_active'] else 'بسته'}
-{'🔄 **تحلیل اجباری**' if signal.get('forced') else ''}
-
-⚠️ **هشدار:** این سیگنال صرفاً جنبه آموزشی دارد.
-"""
-        else:
-            # پیام محدود برای کاربران رایگان
-            message = f"""
-🚨 **سیگنال رایگان FlowAI** 🚨
-
-{action_emoji.get(signal['action'], '🟡')} **عمل:** {signal['action']}
-⭐ **اعتماد:** {confidence_stars}
-
-💰 **قیمت فعلی:** ${signal['current_price']:.2f}
-
-💎 **برای دریافت تحلیل کامل:**
-🔹 اهداف قیمتی دقیق
-🔹 حد ضرر محاسبه شده
-🔹 تحلیل‌های تکنیکال پیشرفته
-🔹 اطلاع‌رسانی فوری
-
-👆 ارتقا به پریمیوم دهید!
-
-⏰ {signal['timestamp'].strftime('%H:%M')}
-"""
+        message = cache['messages'].get(style)
+        if message is None:
+            fields = cache['fields']
+            if style == 'premium':
+                # پیام کامل برای کاربران پریمیوم
+                message = _PREMIUM_SIGNAL_TMPL.format_map(fields)
+            else:
+                # پیام محدود برای کاربران رایگان
+                message = _FREE_SIGNAL_TMPL.format_map(fields)
+            cache['messages'][style] = message
         
         return message
     
+    @staticmethod
+    def _signal_fields(signal: Dict) -> Dict:
+        """مقادیر مشترک قالب‌های پیام (ستاره‌ها، ایموجی، درصدها) برای یک سیگنال"""
+        # فیلدهای عددی با format spec پر می‌شوند و کاراکتر ویژه Markdown ندارند؛ فقط متن action escape می‌شود
+        entry_price = signal['entry_price']
+        indicators = signal['indicators']
+        return {
+            'action_emoji': _ACTION_EMOJI.get(signal['action'], '🟡'),
+            'action': str(signal['action']).translate(_MD_ESCAPE),
+            'confidence': signal['confidence'],
+            'confidence_stars': '⭐' * int(signal['confidence'] * 5),
+            'current_price': signal['current_price'],
+            'entry_price': entry_price,
+            'target_price': signal['target_price'],
+            'target_pct': (signal['target_price'] / entry_price - 1) * 100,
+            'stop_loss': signal['stop_loss'],
+            'stop_pct': (signal['stop_loss'] / entry_price - 1) * 100,
+            'rsi': indicators['rsi'],
+            'macd': indicators['macd'],
+            'sma_20': indicators['sma_20'],
+            'bullish_score': signal['bullish_score'],
+            'bearish_score': signal['bearish_score'],
+            'timestamp': signal['timestamp'],
+            'market_state': 'فعال' if signal['market_active'] else 'بسته',
+            'forced': '🔄 **تحلیل اجباری**' if signal.get('forced') else ''
+        }
+    
     async def send_signal_to_users(self, signal: Dict):
         """ارسال سیگنال به کاربران"""
         try:
-            # ارسال به ادمین‌ها
-            admin_message = self.format_signal_message(signal, 'admin')
-            for admin_id in self.subscribers['admin']:
-                try:
-                    await self.bot.send_message(
-                        chat_id=admin_id,
-                        text=admin_message,
-                        parse_mode='Markdown'
-                    )
-                    logger.info(f"Signal sent to admin {admin_id}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send signal to admin {admin_id}: {e}")
+            # یک snapshot از مشترکین برای کل ارسال (تغییر مجموعه‌ها در حین await اثری ندارد)
+            admin_ids, premium_ids, free_ids = (tuple(self.subscribers[tier]) for tier in ('admin', 'premium', 'free'))
+            free_eligible = signal['confidence'] >= 0.8  # فقط سیگنال‌های قوی
+            free_count = len(free_ids) if free_eligible else 0
             
-            # ارسال به کاربران پریمیوم
-            premium_message = self.format_signal_message(signal, 'premium')
-            for premium_id in self.subscribers['premium']:
-                try:
-                    await self.bot.send_message(
-                        chat_id=premium_id,
-                        text=premium_message,
-                        parse_mode='Markdown'
-                    )
-                    logger.info(f"Signal sent to premium user {premium_id}")
-                except TelegramError as e:
-                    logger.error(f"Failed to send signal to premium user {premium_id}: {e}")
+            # پیام کامل ادمین و پریمیوم یکسان است و فقط یک بار فرمت می‌شود
+            full_message = self.format_signal_message(signal, 'premium')
             
-            # ارسال به کاربران رایگان (محدود)
-            if signal['confidence'] >= 0.8:  # فقط سیگنال‌های قوی
+            # فهرست همه مقصدها: ادمین‌ها، پریمیوم و (فقط برای سیگنال قوی) کاربران رایگان
+            targets = [(user_id, 'admin', full_message) for user_id in admin_ids]
+            targets += [(user_id, 'premium user', full_message) for user_id in premium_ids]
+            if free_count:
                 free_message = self.format_signal_message(signal, 'free')
-                for free_id in self.subscribers['free']:
+                targets += [(user_id, 'free user', free_message) for user_id in free_ids]
+            
+            silent = len(targets) >= SIGNAL_SILENT_BROADCAST_MIN
+            
+            async def send(user_id: int, label: str, text: str):
+                for attempt in range(SIGNAL_SEND_RETRIES + 1):
                     try:
                         await self.bot.send_message(
-                            chat_id=free_id,
-                            text=free_message,
-                            parse_mode='Markdown'
+                            chat_id=user_id,
+                            text=text,
+                            parse_mode='Markdown',
+                            disable_notification=silent and label != 'admin'
                         )
-                        logger.info(f"Signal sent to free user {free_id}")
+                        logger.info(f"Signal sent to {label} {user_id}")
+                        return
+                    except RetryAfter as e:
+                        # 429: فقط همین ارسال پس از مهلت تلگرام دوباره انجام می‌شود
+                        if attempt == SIGNAL_SEND_RETRIES:
+                            logger.error(f"Failed to send signal to {label} {user_id}: {e}")
+                            return
+                        await asyncio.sleep(e.retry_after)
                     except TelegramError as e:
-                        logger.error(f"Failed to send signal to free user {free_id}: {e}")
+                        logger.error(f"Failed to send signal to {label} {user_id}: {e}")
+                        return
+            
+            # هر دسته هم‌زمان ارسال می‌شود و بین دسته‌ها SIGNAL_BATCH_INTERVAL ثانیه فاصله است
+            for start in range(0, len(targets), SIGNAL_SEND_CONCURRENCY):
+                if start:
+                    await asyncio.sleep(SIGNAL_BATCH_INTERVAL)
+                batch = targets[start:start + SIGNAL_SEND_CONCURRENCY]
+                await asyncio.gather(*[send(*target) for target in batch], return_exceptions=True)
             
             # ذخیره در تاریخچه
-            self.signal_history.append({
+            self._record_signal({
                 'signal': signal,
                 'sent_time': datetime.now(),
                 'recipients': {
-                    'admin': len(self.subscribers['admin']),
-                    'premium': len(self.subscribers['premium']),
-                    'free': len(self.subscribers['free']) if signal['confidence'] >= 0.8 else 0
+                    'admin': len(admin_ids),
+                    'premium': len(premium_ids),
+                    'free': free_count
                 }
             })
-            
-            # نگهداری آخرین 50 سیگنال
-            if len(self.signal_history) > 50:
-                self.signal_history.pop(0)
                 
         except Exception as e:
             logger.error(f"Error sending signals: {e}")
     
-    def signal_monitoring_loop(self):
+    def _record_signal(self, entry: Dict):
+        """افزودن سیگنال ارسال شده به تاریخچه"""
+        # سیگنالی که با این append از deque خارج می‌شود از شمارنده‌ها کم می‌شود
+        if len(self.signal_history) == self.signal_history.maxlen:
+            evicted = self.signal_history[0]['signal']
+            self._action_counts[evicted['action']] -= 1
+            self._conf_sum -= evicted['confidence']
+        
+        signal = entry['signal']
+        self._action_counts[signal['action']] = self._action_counts.get(signal['action'], 0) + 1
+        self._conf_sum += signal['confidence']
+        
+        # نگهداری آخرین SIGNAL_HISTORY_SIZE سیگنال (deque با maxlen)
+        self.signal_history.append(entry)
+        self._last_signal_iso = entry['sent_time'].isoformat()
+        
+        self._signal_frame = None
+    
+    def signal_frame(self) -> pd.DataFrame:
+        """تاریخچه سیگنال‌ها به صورت ستونی (action، confidence، entry_price، sent_time) برای گزارش‌ها"""
+        if self._signal_frame is None:
+            history = self.signal_history
+            count = len(history)
+            self._signal_frame = pd.DataFrame({
+                'action': pd.Categorical([s['signal']['action'] for s in history], categories=['BUY', 'SELL', 'HOLD']),
+                'confidence': np.fromiter((s['signal']['confidence'] for s in history), dtype=np.float64, count=count),
+                'entry_price': np.fromiter((s['signal']['entry_price'] for s in history), dtype=np.float64, count=count),
+                'sent_time': pd.to_datetime([s['sent_time'] for s in history])
+            })
+        return self._signal_frame
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """ساخت (یک بار) و برگرداندن event loop پس‌زمینه مدیر سیگنال"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="signal-loop", daemon=True).start()
+        return self._loop
+    
+    def submit(self, coro):
+        """اجرای coroutine روی loop مدیر سیگنال (از هر thread)؛ concurrent.futures.Future برمی‌گرداند"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+    
+    async def signal_monitoring_loop(self):
         """حلقه نظارت بر سیگنال‌ها"""
         logger.info("Signal monitoring started")
         
         while self.running:
             try:
-                # تولید سیگنال AI
-                signal = get_ai_trading_signal(force_analysis=False)
+                # تولید سیگنال AI (blocking؛ در thread جداگانه)
+                signal = await asyncio.to_thread(get_ai_trading_signal, force_analysis=False)
                 
                 if signal:
                     logger.info(f"New signal generated: {signal['action']} with confidence {signal['confidence']:.2f}")
                     
                     # ارسال سیگنال به کاربران
-                    asyncio.run(self.send_signal_to_users(signal))
+                    await self.send_signal_to_users(signal)
                 
                 # انتظار تا چک بعدی
-                time.sleep(self.check_interval)
+                await asyncio.sleep(self.check_interval)
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error in signal monitoring loop: {e}")
-                time.sleep(60)  # انتظار 1 دقیقه در صورت خطا
+                await asyncio.sleep(60)  # انتظار 1 دقیقه در صورت خطا
     
     def start_monitoring(self):
         """شروع نظارت خودکار"""
         if not self.running:
             self.running = True
-            self.signal_thread = threading.Thread(target=self.signal_monitoring_loop, daemon=True)
-            self.signal_thread.start()
+            self._monitor_future = self.submit(self.signal_monitoring_loop())
             logger.info("Automatic signal monitoring started")
     
     def stop_monitoring(self):
         """توقف نظارت خودکار"""
         self.running = False
-        if self.signal_thread:
-            self.signal_thread.join(timeout=5)
+        if self._monitor_future:
+            # لغو task روی loop پس‌زمینه (انتظار یا تحلیل جاری بلافاصله قطع می‌شود)
+            self._monitor_future.cancel()
+            self._monitor_future = None
         logger.info("Automatic signal monitoring stopped")
     
+    async def close(self):
+        """بستن اتصال‌های HTTP ربات سیگنال (هنگام خاموش شدن ربات)"""
+        try:
+            if self._loop is None:
+                await self.bot.shutdown()
+            else:
+                # اتصال‌ها به loop مدیر سیگنال تعلق دارند و همان‌جا بسته می‌شوند
+                await asyncio.wrap_future(self.submit(self.bot.shutdown()))
+        except Exception as e:
+            logger.error(f"Error closing signal bot connections: {e}")
+    
     async def send_manual_signal(self, user_id: int, force: bool = True) -> bool:
         """ارسال سیگنال دستی"""
         try:
-            signal = get_ai_trading_signal(force_analysis=force)
+            signal = await asyncio.to_thread(get_ai_trading_signal, force_analysis=force)
             
             if signal:
-                # تشخیص نوع کاربر
-                if user_id in self.subscribers['admin']:
-                    tier = 'admin'
-                elif user_id in self.subscribers['premium']:
-                    tier = 'premium'
-                else:
-                    tier = 'free'
-                
+                # تشخیص نوع کاربر (کاربر ناشناس رایگان است)
+                tier = self._user_tier.get(user_id, 'free')
                 message = self.format_signal_message(signal, tier)
                 
                 await self.bot.send_message(
@@ -242,24 +410,17 @@ class TelegramSignalManager:
                 'last_signal_time': None
             }
         
+        # آمار از شمارنده‌های جاری؛ بدون پیمایش تاریخچه
         total = len(self.signal_history)
-        buy_count = sum(1 for s in self.signal_history if s['signal']['action'] == 'BUY')
-        sell_count = sum(1 for s in self.signal_history if s['signal']['action'] == 'SELL')
-        hold_count = sum(1 for s in self.signal_history if s['signal']['action'] == 'HOLD')
-        avg_confidence = sum(s['signal']['confidence'] for s in self.signal_history) / total
         
         return {
             'total_signals': total,
-            'buy_signals': buy_count,
-            'sell_signals': sell_count,
-            'hold_signals': hold_count,
-            'avg_confidence': avg_confidence,
-            'last_signal_time': self.signal_history[-1]['sent_time'] if self.signal_history else None,
-            'subscribers_count': {
-                'admin': len(self.subscribers['admin']),
-                'premium': len(self.subscribers['premium']),
-                'free': len(self.subscribers['free'])
-            }
+            'buy_signals': self._action_counts['BUY'],
+            'sell_signals': self._action_counts['SELL'],
+            'hold_signals': self._action_counts['HOLD'],
+            'avg_confidence': self._conf_sum / total,
+            'last_signal_time': self.signal_history[-1]['sent_time'],
+            'subscribers_count': self.subscriber_counts()
         }
 
 # Global instance
@@ -274,8 +435,8 @@ def stop_signal_monitoring():
     signal_manager.stop_monitoring()
 
 async def send_manual_analysis(user_id: int) -> bool:
-    """ارسال تحلیل دستی"""
-    return await signal_manager.send_manual_signal(user_id, force=True)
+    """ارسال تحلیل دستی (روی loop مدیر سیگنال؛ اتصال‌های ربات فقط به همان loop تعلق دارند)"""
+    return await asyncio.wrap_future(signal_manager.submit(signal_manager.send_manual_signal(user_id, force=True)))
 
 def get_signal_stats() -> Dict:
     """دریافت آمار سیگنال‌ها"""
@@ -11,6 +11,57 @@ from ..telegram.premium_manager import premium_manager
 
 logger = logging.getLogger(__name__)
 
+# کیبوردهای منو ثابت هستند و یک بار در زمان import ساخته می‌شوند
+_MENU_TOP_ROWS = [
+    [
+        KeyboardButton("💰 Live Gold Price"),
+        KeyboardButton("🎯 ICT Analysis")
+    ],
+    [
+        KeyboardButton("🔍 Quick Analysis"),
+        KeyboardButton("🚨 Trading Signals")
+    ]
+]
+
+_MENU_BOTTOM_ROWS = [
+    [
+        KeyboardButton("👤 My Profile"),
+        KeyboardButton("📞 Support")
+    ]
+]
+
+# منوی اصلی کاربر پریمیوم
+_PREMIUM_MENU_MARKUP = ReplyKeyboardMarkup(_MENU_TOP_ROWS + [
+    [
+        KeyboardButton("📈 HTF Analysis"),
+        KeyboardButton("🎯 ICT Patterns")
+    ],
+    [
+        KeyboardButton("🧪 Personal Backtest"),
+        KeyboardButton("⚙️ Advanced Settings")
+    ],
+    [
+        KeyboardButton("📱 VIP Alerts"),
+        KeyboardButton("🎯 Exclusive Signals")
+    ],
+    [
+        KeyboardButton("📊 Performance Report"),
+        KeyboardButton("🔍 Deep Analysis")
+    ]
+] + _MENU_BOTTOM_ROWS, resize_keyboard=True, one_time_keyboard=False)
+
+# منوی اصلی کاربر رایگان
+_FREE_MENU_MARKUP = ReplyKeyboardMarkup(_MENU_TOP_ROWS + [
+    [
+        KeyboardButton("💎 Upgrade to Premium"),
+        KeyboardButton("ℹ️ ICT Guide")
+    ],
+    [
+        KeyboardButton("🎁 Free Features"),
+        KeyboardButton("📋 Limitations")
+    ]
+] + _MENU_BOTTOM_ROWS, resize_keyboard=True, one_time_keyboard=False)
+
 class ICTUserMenu:
     def __init__(self):
         self.premium_users = set(TELEGRAM_PREMIUM_USERS)
@@ -22,54 +73,7 @@ class ICTUserMenu:
     
     def main_menu_keyboard(self, is_premium: bool = False):
         """منوی اصلی کاربر ICT-Enhanced"""
-        keyboard = [
-            [
-                KeyboardButton("💰 Live Gold Price"),
-                KeyboardButton("🎯 ICT Analysis")
-            ],
-            [
-                KeyboardButton("🔍 Quick Analysis"),
-                KeyboardButton("🚨 Trading Signals")
-            ]
-        ]
-        
-        if is_premium:
-            keyboard.extend([
-                [
-                    KeyboardButton("📈 HTF Analysis"),
-                    KeyboardButton("🎯 ICT Patterns")
-                ],
-                [
-                    KeyboardButton("🧪 Personal Backtest"),
-                    KeyboardButton("⚙️ Advanced Settings")
-                ],
-                [
-                    KeyboardButton("📱 VIP Alerts"),
-                    KeyboardButton("🎯 Exclusive Signals")
-                ],
-                [
-                    KeyboardButton("📊 Performance Report"),
-                    KeyboardButton("🔍 Deep Analysis")
-                ]
-            ])
-        else:
-            keyboard.extend([
-                [
-                    KeyboardButton("💎 Upgrade to Premium"),
-                    KeyboardButton("ℹ️ ICT Guide")
-                ],
-                [
-                    KeyboardButton("🎁 Free Features"),
-                    KeyboardButton("📋 Limitations")
-                ]
-            ])
-        
-        keyboard.append([
-            KeyboardButton("👤 My Profile"),
-            KeyboardButton("📞 Support")
-        ])
-        
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        return _PREMIUM_MENU_MARKUP if is_premium else _FREE_MENU_MARKUP
 
 # Instance global
 user_menu = ICTUserMenu()
@@ -13,7 +13,8 @@ import psutil
 from pathlib import Path
 from datetime import datetime, timedelta
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import AIORateLimiter, Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.request import HTTPXRequest
 
 # Add project root to Python path
 project_root = Path(__file__).parent
@@ -31,14 +32,153 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Inline keyboards are static, so each markup is built once at import time
+_START_ADMIN_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🎛️ منوی مدیریت", callback_data="main_menu"),
+        InlineKeyboardButton("📊 وضعیت سریع", callback_data="quick_status")
+    ],
+    [
+        InlineKeyboardButton("📈 سیگنال‌ها", callback_data="signals"),
+        InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest")
+    ],
+    [
+        InlineKeyboardButton("ℹ️ راهنما", callback_data="help")
+    ]
+])
+
+_START_USER_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📈 سیگنال‌ها", callback_data="signals"),
+        InlineKeyboardButton("ℹ️ راهنما", callback_data="help")
+    ]
+])
+
+_ADMIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📊 وضعیت سیستم", callback_data="system_status"),
+        InlineKeyboardButton("📈 سیگنال‌های فعال", callback_data="active_signals")
+    ],
+    [
+        InlineKeyboardButton("⚙️ تنظیمات ICT", callback_data="ict_settings"),
+        InlineKeyboardButton("🛡️ مدیریت ریسک", callback_data="risk_management")
+    ],
+    [
+        InlineKeyboardButton("📰 رصد اخبار", callback_data="news_monitor"),
+        InlineKeyboardButton("🤖 تنظیمات AI", callback_data="ai_settings")
+    ],
+    [
+        InlineKeyboardButton("📊 آمار عملکرد", callback_data="performance_stats"),
+        InlineKeyboardButton("💹 تحلیل بازار", callback_data="market_analysis")
+    ],
+    [
+        InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest_menu"),
+        InlineKeyboardButton("📋 لاگ‌ها", callback_data="view_logs")
+    ],
+    [
+        InlineKeyboardButton("🔄 عملیات سیستم", callback_data="system_operations"),
+        InlineKeyboardButton("ℹ️ راهنما", callback_data="help_menu")
+    ]
+])
+
+_MAIN_MENU_CALLBACK_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("📊 وضعیت سیستم", callback_data="system_status"),
+        InlineKeyboardButton("📈 سیگنال‌های فعال", callback_data="active_signals")
+    ],
+    [
+        InlineKeyboardButton("⚙️ تنظیمات ICT", callback_data="ict_settings"),
+        InlineKeyboardButton("🛡️ مدیریت ریسک", callback_data="risk_management")
+    ],
+    [
+        InlineKeyboardButton("📰 رصد اخبار", callback_data="news_monitor"),
+        InlineKeyboardButton("🤖 تنظیمات AI", callback_data="ai_settings")
+    ],
+    [
+        InlineKeyboardButton("📊 آمار عملکرد", callback_data="performance_stats"),
+        InlineKeyboardButton("💹 تحلیل بازار", callback_data="market_analysis")
+    ],
+    [
+        InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest_menu"),
+        InlineKeyboardButton("📋 لاگ‌ها", callback_data="view_logs")
+    ]
+])
+
+_QUICK_STATUS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔄 بروزرسانی", callback_data="quick_status"),
+        InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")
+    ]
+])
+
+_BACKTEST_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("▶️ شروع بک‌تست جدید", callback_data="start_backtest"),
+        InlineKeyboardButton("📊 نتایج قبلی", callback_data="backtest_results")
+    ],
+    [
+        InlineKeyboardButton("⚙️ تنظیمات", callback_data="backtest_settings"),
+        InlineKeyboardButton("📈 مقایسه استراتژی", callback_data="strategy_comparison")
+    ],
+    [InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")]
+])
+
+_BACKTEST_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🔄 بروزرسانی", callback_data="backtest")]])
+
+_SYSTEM_STATUS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔄 بروزرسانی", callback_data="system_status"),
+        InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")
+    ]
+])
+
+_ACTIVE_SIGNALS_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🔄 بروزرسانی", callback_data="active_signals"),
+        InlineKeyboardButton("📊 تحلیل کامل", callback_data="market_analysis")
+    ],
+    [InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")]
+])
+
+_SIGNALS_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🔄 بروزرسانی", callback_data="signals")]])
+
 class FlowAITelegramBot:
     def __init__(self, token, admin_ids):
         self.token = token
         self.admin_ids = admin_ids
-        self.application = Application.builder().token(token).build()
+        # AIORateLimiter backs off and retries automatically on 429 responses;
+        # a larger HTTPX pool keeps concurrent handler replies from queueing on connections
+        self.application = (
+            Application.builder()
+            .token(token)
+            .request(HTTPXRequest(connection_pool_size=32, pool_timeout=5.0))
+            .rate_limiter(AIORateLimiter())
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         self.start_time = datetime.now()
         self.setup_handlers()
     
+    async def _post_shutdown(self, application):
+        """Close the pooled HTTP session shared by data fetchers, the signal bot and notification clients"""
+        try:
+            from flow_ai_core.http_client import close_http_session
+            close_http_session()
+        except Exception as e:
+            logger.error(f"Error closing HTTP session: {e}")
+        
+        try:
+            from flow_ai_core.telegram.signal_manager import signal_manager
+            await signal_manager.close()
+        except Exception as e:
+            logger.error(f"Error closing signal bot: {e}")
+        
+        try:
+            from flow_ai_core.notification_system import notification_system
+            await notification_system.close()
+        except Exception as e:
+            logger.error(f"Error closing notification clients: {e}")
+    
     def setup_handlers(self):
         """Setup all command and callback handlers"""
         # Main commands
@@ -134,31 +274,8 @@ class FlowAITelegramBot:
 💡 **نکته:** برای دسترسی کامل، با مدیر تماس بگیرید.
 """
         
-        # Create inline keyboard for quick access
-        keyboard = []
-        if self.is_admin(user_id):
-            keyboard = [
-                [
-                    InlineKeyboardButton("🎛️ منوی مدیریت", callback_data="main_menu"),
-                    InlineKeyboardButton("📊 وضعیت سریع", callback_data="quick_status")
-                ],
-                [
-                    InlineKeyboardButton("📈 سیگنال‌ها", callback_data="signals"),
-                    InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest")
-                ],
-                [
-                    InlineKeyboardButton("ℹ️ راهنما", callback_data="help")
-                ]
-            ]
-        else:
-            keyboard = [
-                [
-                    InlineKeyboardButton("📈 سیگنال‌ها", callback_data="signals"),
-                    InlineKeyboardButton("ℹ️ راهنما", callback_data="help")
-                ]
-            ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Quick-access keyboard for the user's role
+        reply_markup = _START_ADMIN_MARKUP if self.is_admin(user_id) else _START_USER_MARKUP
         await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
         logger.info(f"Start command from user: {user_id} ({user_name})")
     
@@ -170,34 +287,7 @@ class FlowAITelegramBot:
             await update.message.reply_text("❌ شما دسترسی به منوی مدیریت ندارید.")
             return
         
-        keyboard = [
-            [
-                InlineKeyboardButton("📊 وضعیت سیستم", callback_data="system_status"),
-                InlineKeyboardButton("📈 سیگنال‌های فعال", callback_data="active_signals")
-            ],
-            [
-                InlineKeyboardButton("⚙️ تنظیمات ICT", callback_data="ict_settings"),
-                InlineKeyboardButton("🛡️ مدیریت ریسک", callback_data="risk_management")
-            ],
-            [
-                InlineKeyboardButton("📰 رصد اخبار", callback_data="news_monitor"),
-                InlineKeyboardButton("🤖 تنظیمات AI", callback_data="ai_settings")
-            ],
-            [
-                InlineKeyboardButton("📊 آمار عملکرد", callback_data="performance_stats"),
-                InlineKeyboardButton("💹 تحلیل بازار", callback_data="market_analysis")
-            ],
-            [
-                InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest_menu"),
-                InlineKeyboardButton("📋 لاگ‌ها", callback_data="view_logs")
-            ],
-            [
-                InlineKeyboardButton("🔄 عملیات سیستم", callback_data="system_operations"),
-                InlineKeyboardButton("ℹ️ راهنما", callback_data="help_menu")
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _ADMIN_MENU_MARKUP
         
         stats = self.get_system_stats()
         status_emoji = "🟢" if stats and stats['cpu'] < 80 else "🟡"
@@ -278,30 +368,7 @@ class FlowAITelegramBot:
     
     async def show_main_menu_callback(self, query):
         """Show main menu via callback"""
-        keyboard = [
-            [
-                InlineKeyboardButton("📊 وضعیت سیستم", callback_data="system_status"),
-                InlineKeyboardButton("📈 سیگنال‌های فعال", callback_data="active_signals")
-            ],
-            [
-                InlineKeyboardButton("⚙️ تنظیمات ICT", callback_data="ict_settings"),
-                InlineKeyboardButton("🛡️ مدیریت ریسک", callback_data="risk_management")
-            ],
-            [
-                InlineKeyboardButton("📰 رصد اخبار", callback_data="news_monitor"),
-                InlineKeyboardButton("🤖 تنظیمات AI", callback_data="ai_settings")
-            ],
-            [
-                InlineKeyboardButton("📊 آمار عملکرد", callback_data="performance_stats"),
-                InlineKeyboardButton("💹 تحلیل بازار", callback_data="market_analysis")
-            ],
-            [
-                InlineKeyboardButton("🔄 بک‌تست", callback_data="backtest_menu"),
-                InlineKeyboardButton("📋 لاگ‌ها", callback_data="view_logs")
-            ]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _MAIN_MENU_CALLBACK_MARKUP
         
         stats = self.get_system_stats()
         status_emoji = "🟢" if stats and stats['cpu'] < 80 else "🟡"
@@ -357,9 +424,7 @@ class FlowAITelegramBot:
 لطفاً مجدداً تلاش کنید.
 """
         
-        keyboard = [[InlineKeyboardButton("🔄 بروزرسانی", callback_data="quick_status"),
-                    InlineKeyboardButton("🔙 بازگشت", callback_data="main_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _QUICK_STATUS_MARKUP
         
         await query.edit_message_text(status_text, reply_markup=reply_markup, parse_mode='Markdown')
     
@@ -399,18 +464,7 @@ class FlowAITelegramBot:
 💡 **نکته:** بک‌تست بر اساس داده‌های تاریخی انجام می‌شود و نتایج گذشته تضمینی برای آینده نیست.
 """
         
-        keyboard = [
-            [
-                InlineKeyboardButton("▶️ شروع بک‌تست جدید", callback_data="start_backtest"),
-                InlineKeyboardButton("📊 نتایج قبلی", callback_data="backtest_results")
-            ],
-            [
-                InlineKeyboardButton("⚙️ تنظیمات", callback_data="backtest_settings"),
-                InlineKeyboardButton("📈 مقایسه استراتژی", callback_data="strategy_comparison")
-            ],
-            [InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _BACKTEST_MENU_MARKUP
         
         await query.edit_message_text(backtest_text, reply_markup=reply_markup, parse_mode='Markdown')
     
@@ -430,8 +484,7 @@ class FlowAITelegramBot:
 📞 **برای دسترسی کامل:** با مدیر تماس بگیرید.
 """
         
-        keyboard = [[InlineKeyboardButton("🔄 بروزرسانی", callback_data="backtest")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _BACKTEST_MARKUP
         
         await query.edit_message_text(backtest_text, reply_markup=reply_markup, parse_mode='Markdown')
     
@@ -490,9 +543,7 @@ class FlowAITelegramBot:
 ⏰ **زمان:** {datetime.now().strftime('%H:%M:%S')}
 """
         
-        keyboard = [[InlineKeyboardButton("🔄 بروزرسانی", callback_data="system_status"),
-                    InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _SYSTEM_STATUS_MARKUP
         
         await query.edit_message_text(status_text, reply_markup=reply_markup, parse_mode='Markdown')
     
@@ -536,14 +587,7 @@ class FlowAITelegramBot:
 💡 سیگنال‌های جدید به صورت خودکار ارسال می‌شوند.
 """
         
-        keyboard = [
-            [
-                InlineKeyboardButton("🔄 بروزرسانی", callback_data="active_signals"),
-                InlineKeyboardButton("📊 تحلیل کامل", callback_data="market_analysis")
-            ],
-            [InlineKeyboardButton("🔙 منوی اصلی", callback_data="main_menu")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _ACTIVE_SIGNALS_MARKUP
         
         await query.edit_message_text(signals_text, reply_markup=reply_markup, parse_mode='Markdown')
     
@@ -568,8 +612,7 @@ class FlowAITelegramBot:
 📞 **برای دسترسی کامل:** با مدیر تماس بگیرید.
 """
         
-        keyboard = [[InlineKeyboardButton("🔄 بروزرسانی", callback_data="signals")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = _SIGNALS_MARKUP
         
         await query.edit_message_text(signals_text, reply_markup=reply_markup, parse_mode='Markdown')
     